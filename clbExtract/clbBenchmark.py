@@ -0,0 +1,406 @@
+"""
+Synthetic Cellebrite workbooks and a benchmark for clbExtract.
+
+Writes Cellebrite formatted Excel files with a Device Info tab and a Contacts tab of
+multi line Entries, so clbExtract can be timed without using case data. The number of
+contacts, the mix of apps and the number of entries per contact can all be set.
+
+The benchmark runs clbExtract over a workbook of each size and records the wall time,
+peak memory and rows per second of each stage and each app parser.
+
+Formatted unapologetically with Black
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import os
+import random
+import time
+
+import openpyxl
+import pandas as pd
+
+import clbExtract
+
+# Details
+__description__ = (
+    "Generates synthetic Cellebrite workbooks and benchmarks clbExtract against them."
+)
+__author__ = "facelessg00n"
+__version__ = "0.1"
+
+# Options
+sizes = [10000, 100000, 1000000]
+entriesPerContact = 3
+benchmarkDir = "benchmark"
+resultsFile = "clbBenchmark-results.csv"
+seed = 1
+
+# Share of contacts from each app, as the Source column values Cellebrite uses. None is an
+# iPhone native contact.
+appMix = {
+    None: 20,
+    "Phone": 10,
+    "WhatsApp": 25,
+    "WeChat": 5,
+    "Facebook Messenger": 5,
+    "Instagram": 5,
+    "Line": 2,
+    "Outlook": 3,
+    "Recents": 5,
+    "Signal": 3,
+    "Signal Private Messenger": 3,
+    "Snapchat": 5,
+    "Telegram": 4,
+    "Threema": 2,
+    "Zalo": 3,
+}
+
+# Entry lines for each app, the first entries are always written and the rest are picked
+# at random to make up the entries per contact
+appEntries = {
+    None: [
+        "Phone-Mobile: +61 4{n:08d}",
+        "Email-Home: person{n}@example.com",
+        "Phone-Home: (02) 9{n:07d}",
+        "Phone-Work: 03 9{n:07d}",
+        "Address-Home: {n} Example St",
+    ],
+    "Phone": [
+        "Phone-: 04{n:08d}",
+        "Phone-Mobile: +61 4{n:08d}",
+        "Email-: person{n}@example.com",
+    ],
+    "WhatsApp": [
+        "Phone-Mobile: +61 4{n:08d}",
+        "User ID-WhatsApp User Id: 614{n:08d}@s.whatsapp.net",
+        "User ID-Push Name: push{n}",
+        "Phone-Home: +61 2 9{n:07d}",
+        "Web address-Professional: https://example.com/{n}",
+        "Email-Professional: biz{n}@example.com",
+    ],
+    "WeChat": [
+        "User ID-WeChat ID: wxid_{n}",
+        "User ID-QQ: {n}",
+        "User ID-Username: wechat{n}",
+        "User ID-LinkedIn ID: li{n}",
+        "User ID-Facebook ID: {n}",
+    ],
+    "Facebook Messenger": [
+        "User ID-Facebook Id: 1000{n}",
+        "User ID-Username: fb.{n}",
+    ],
+    "Instagram": [
+        "User ID-Username: insta{n}",
+        "User ID-Instagram Id: {n}",
+    ],
+    "Line": [
+        "User ID-User ID: u{n:032d}",
+        "User ID-Server: s{n}",
+        "User ID-Address Book Name: line{n}",
+    ],
+    "Outlook": [
+        "Email-Work: person{n}@example.org",
+        "Phone-Work: +44 20 7946 {n:04d}",
+        "Phone-Mobile: +44 7700 9{n:05d}",
+    ],
+    "Recents": [
+        "Phone-: +61 4{n:08d}",
+    ],
+    "Signal": [
+        "User ID-Username: signal{n}",
+        "Phone-Mobile: +61 4{n:08d}",
+        "Phone-Home: 08 8{n:07d}",
+    ],
+    "Signal Private Messenger": [
+        "Phone-: +614{n:08d}",
+        "User ID-: {n:08d}-aaaa-bbbb-cccc-{n:012d}",
+        "User ID-Nickname: nick{n}",
+        "User ID-Username: spm{n}",
+        "User ID-ProfileKey: key{n}",
+    ],
+    "Snapchat": [
+        "User ID-Username: snap{n}",
+        "User ID-User ID: {n:08d}-snap",
+    ],
+    "Telegram": [
+        "Phone-Mobile: +61 4{n:08d}",
+        "User ID-Peer: {n}",
+        "User ID-Username: tg{n}",
+    ],
+    "Threema": [
+        "User ID-identity: T{n:07d}",
+        "User ID-Username: threema{n}",
+    ],
+    "Zalo": [
+        "User ID-User Name: zalo{n}",
+        "User ID-Id: {n}",
+    ],
+}
+
+# Minimum entries for each app, eg. WhatsApp contacts always have a number and user ID
+appRequired = {"WhatsApp": 2, "Line": 2, "Signal Private Messenger": 2}
+
+
+# ------ Workbook generator ----------------------------------------------------------------------
+# Writes a workbook laid out like a Cellebrite export, a title row above the header on each
+# tab. Uses the openpyxl write only workbook so large files do not need much memory.
+def generateWorkbook(outputFile, contactCount, apps=None, entries=None, imei=None):
+    apps = apps or appMix
+    entries = entries or entriesPerContact
+    generator = random.Random(seed + contactCount)
+    imei = imei or "35{:013d}".format(generator.randrange(10**13))
+
+    workbook = openpyxl.Workbook(write_only=True)
+    summarySheet = workbook.create_sheet("Summary")
+    summarySheet.append(["Extraction Report"])
+    summarySheet.append(["Synthetic workbook generated by clbBenchmark"])
+
+    infoSheet = workbook.create_sheet(clbExtract.clbPhoneInfo)
+    infoSheet.append(["Device Info"])
+    infoSheet.append(["#", "Name", "Value", "Category"])
+    deviceInfo = [
+        ("Model", "iPhone 12"),
+        ("OS Version", "16.1"),
+        ("IMEI", imei),
+        ("IMEI2", imei[:-1] + str((int(imei[-1]) + 1) % 10)),
+        ("Serial", "SYN{}".format(contactCount)),
+    ]
+    for x, (name, value) in enumerate(deviceInfo):
+        infoSheet.append([x + 1, name, value, "Device"])
+
+    contactSheet = workbook.create_sheet(clbExtract.clbContactSheet)
+    contactSheet.append(["Contacts"])
+    contactSheet.append(
+        [
+            "#",
+            "Name",
+            "Interaction Statuses",
+            "Entries",
+            "Source",
+            "Account",
+            "Deleted",
+        ]
+    )
+    appNames = list(apps)
+    appWeights = [apps[x] for x in appNames]
+    for n in range(1, contactCount + 1):
+        source = generator.choices(appNames, appWeights)[0]
+        contactSheet.append(
+            [
+                n,
+                "Person {}".format(n),
+                "Shared" if source == "WhatsApp" and n % 50 == 0 else None,
+                contactEntries(generator, source, n, entries),
+                source,
+                "account{}".format(n % 3) if source is not None else None,
+                None,
+            ]
+        )
+    workbook.save(outputFile)
+
+
+# Entry lines for one contact, between 1 and twice the entries per contact
+def contactEntries(generator, source, n, entries):
+    templates = appEntries[source]
+    lineCount = generator.randint(
+        max(1, appRequired.get(source, 1)), max(2, entries * 2 - 1)
+    )
+    lines = templates[: appRequired.get(source, 1)]
+    while len(lines) < lineCount:
+        lines.append(generator.choice(templates))
+    return "\n".join(x.format(n=n) for x in lines)
+
+
+def syntheticFile(contactCount):
+    return os.path.join(benchmarkDir, "synthetic-{}.xlsx".format(contactCount))
+
+
+# ------ Benchmark -------------------------------------------------------------------------------
+# Peak memory uses the same measure as clbExtract --profile, reset for each stage on Linux
+class stageTimer:
+    def __init__(self, results, contactCount, stage) -> None:
+        self.results = results
+        self.contactCount = contactCount
+        self.stage = stage
+        self.rows = None
+
+    def __enter__(self):
+        clbExtract.resetPeakMemory()
+        self.startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        seconds = time.perf_counter() - self.startTime
+        self.results.append(
+            {
+                "contacts": self.contactCount,
+                "stage": self.stage,
+                "seconds": round(seconds, 3),
+                "rows": self.rows,
+                "rowsPerSec": round(self.rows / seconds) if self.rows else None,
+                "peakMB": clbExtract.peakMemory(),
+            }
+        )
+
+
+# Wraps an app parser so it records its own stage
+def timedParser(results, contactCount, source, parserFunc):
+    def runParser(appPD, phone):
+        with stageTimer(results, contactCount, "parse {}".format(source)) as timer:
+            timer.rows = len(appPD)
+            parserFunc(appPD, phone)
+
+    return runParser
+
+
+# Runs clbExtract over one synthetic workbook, in its own process so the memory use of
+# one size does not affect the next
+def benchmarkFile(inputFile, contactCount, outputDir):
+    clbExtract.useCache = False
+    clbExtract.showProgress = False
+    results = []
+    for source, parserFunc in list(clbExtract.appParsers.items()):
+        clbExtract.appParsers[source] = timedParser(
+            results, contactCount, source, parserFunc
+        )
+
+    os.makedirs(outputDir, exist_ok=True)
+    inputFile = os.path.abspath(inputFile)
+    os.chdir(outputDir)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        phone = clbExtract.phoneData(
+            inFile="synthetic-{}".format(contactCount), inProvenance="EXAM"
+        )
+        # Outputs go through the background writer and are renamed from their .part
+        # files, the same as a normal run
+        phone.writer = clbExtract.openWriter(phone)
+        completed = False
+        try:
+            with stageTimer(results, contactCount, "total") as totalTimer:
+                totalTimer.rows = contactCount
+                with stageTimer(results, contactCount, "open workbook"):
+                    workbook = clbExtract.clbWorkbook(inputFile)
+                with stageTimer(results, contactCount, "read device info") as timer:
+                    deviceInfo = clbExtract.probeDeviceInfo(workbook)
+                    timer.rows = len(deviceInfo)
+                with stageTimer(results, contactCount, "read contacts") as timer:
+                    contactsPD = clbExtract.readContacts(workbook)
+                    timer.rows = len(contactsPD)
+                with stageTimer(results, contactCount, "process apps") as timer:
+                    clbExtract.processApps(contactsPD, phone)
+                    timer.rows = len(contactsPD)
+                with stageTimer(results, contactCount, "write outputs"):
+                    if phone.writer is not None:
+                        phone.writer.close()
+                workbook.close()
+            completed = True
+        finally:
+            if phone.writer is not None:
+                phone.writer.close()
+            clbExtract.closeOutputs(phone, completed)
+    return results
+
+
+def runBenchmark():
+    os.makedirs(benchmarkDir, exist_ok=True)
+    results = []
+    for contactCount in sizes:
+        inputFile = syntheticFile(contactCount)
+        if not os.path.exists(inputFile):
+            print("Generating {} contacts to {}".format(contactCount, inputFile))
+            startTime = time.perf_counter()
+            generateWorkbook(inputFile, contactCount)
+            print("Generated in {:.1f}s".format(time.perf_counter() - startTime))
+
+        print("Benchmarking {} contacts".format(contactCount))
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            fileResults = pool.submit(
+                benchmarkFile,
+                inputFile,
+                contactCount,
+                os.path.join(benchmarkDir, "output-{}".format(contactCount)),
+            ).result()
+        for x in fileResults:
+            print(
+                "{contacts:>8} {stage:<36} {seconds:>9.3f}s {rowsPerSec!s:>10} rows/s {peakMB!s:>8} MB".format(
+                    **x
+                )
+            )
+        results.extend(fileResults)
+
+    pd.DataFrame(results).to_csv(resultsFile, index=False)
+    print("Results saved to {}".format(resultsFile))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__description__,
+        epilog="Developed by {}, version {}".format(str(__author__), str(__version__)),
+    )
+
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        dest="sizes",
+        required=False,
+        help="Comma separated contact counts to benchmark, default 10000,100000,1000000.",
+    )
+
+    parser.add_argument(
+        "-e",
+        "--entries",
+        dest="entries",
+        required=False,
+        type=int,
+        help="Average entries per contact, default 3.",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--apps",
+        dest="apps",
+        required=False,
+        help="App mix as App=weight pairs, eg. WhatsApp=50,WeChat=20,Native=30.",
+    )
+
+    parser.add_argument(
+        "-g",
+        "--generate",
+        dest="generate",
+        required=False,
+        help="Only generate a workbook to this file, with the first of --sizes contacts.",
+    )
+
+    parser.add_argument(
+        "-d",
+        "--dir",
+        dest="benchmarkDir",
+        required=False,
+        help="Folder for the synthetic workbooks and outputs, default benchmark.",
+    )
+
+    args = parser.parse_args()
+
+    if args.sizes:
+        sizes = [int(x) for x in args.sizes.split(",")]
+    if args.entries:
+        entriesPerContact = args.entries
+    if args.benchmarkDir:
+        benchmarkDir = args.benchmarkDir
+    if args.apps:
+        appMix = {}
+        for x in args.apps.split(","):
+            app, weight = x.rsplit("=", 1)
+            # Native contacts have no Source
+            appMix[None if app == "Native" else app] = float(weight)
+        unknownApps = [x for x in appMix if x not in appEntries]
+        if unknownApps:
+            parser.error("No entries defined for {}".format(unknownApps))
+
+    if args.generate:
+        generateWorkbook(args.generate, sizes[0])
+        print("Generated {} contacts to {}".format(sizes[0], args.generate))
+    else:
+        runBenchmark()
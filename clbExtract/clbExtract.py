@@ -9,6 +9,44 @@ Formatted unapologetically with Black
 # FIXME - Fix Og Signal parser, Column order
 
 Changelog
+0.10 - Performance improvements for large exports
+    - Workbook is opened once per file and shared between the Device Info and Contacts tabs
+    - Option to stream the Contacts tab in chunks to keep memory use flat on large exports
+    - App parsers share one field extraction engine driven by a table of entry prefixes
+    - Contacts are grouped by Source once and dispatched through a registry of app parsers,
+        parsers for other apps can be registered from outside the script
+    - Bulk mode can process files in parallel with --workers, each file has its own phoneData
+        and worker logs and a run summary are merged at the end
+    - Parsed sheets can be cached as Parquet with --cache so re-running on the same export
+        skips the Excel parse
+    - Entries are exploded into long format rather than split into a column per entry, so
+        contacts with many entries no longer add columns for every contact of that app
+    - Contacts can also be written to a single SQLite or Parquet store with --store
+    - Bulk runs build an index of identifiers found on more than one device, see --report
+        and --query
+    - Bulk runs skip files unchanged since they were last processed, recorded in
+        clbExtract-manifest.json
+    - Progress, rows per second and time remaining are shown while large Contacts tabs load
+    - Sheets are streamed straight from the xlsx with an incremental XML parser instead of
+        pandas and openpyxl
+    - Phone numbers are normalised by one engine with per country rules (--country), native,
+        recent and WhatsApp outputs gain E.164 columns, WhatsApp national columns too
+    - --profile records the time, CPU, rows and peak memory of each stage, parser and file
+    - Device Info is probed for the IMEI, IMEI2, model and OS version instead of reading the
+        whole tab, the model and OS version are added to the bulk summary
+    - Outputs are written by background threads while parsing continues
+    - --format writes the outputs as gzip or zstd compressed CSV, Parquet or Arrow
+    - --watch processes workbooks as they arrive in an intake folder
+    - The GUI processes files in the background and can cancel a run
+    - --max-memory schedules bulk workers within a memory budget, largest files first
+    - Bulk runs are journaled and can be resumed with --resume, outputs are renamed
+        into place once a file completes, --timeout stops files that hang
+    - --app-workers parses the apps of a file at the same time in worker processes
+    - Source, Account and the IMEI, input file and provenance columns are held as
+        categoricals and only written out as text when saved
+    - --sheets reads the call log and chat participants into a PARTIES output in the
+        same pass as the contacts
+
 0.9 - Fix - Handles name change to Signal Private Messenger and extra data columns
     - prints version to command line
     - Fix bug where files ending in .XLXS (Caps) wouldn't be automatically found
@@ -46,17 +84,65 @@ Changelog
 """
 
 import argparse
+import ctypes
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+import gc
 import glob
+import hashlib
+import importlib
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.util
+from multiprocessing import shared_memory
+import numpy as np
 import os
 import pandas as pd
 from pathlib import Path
+import re
+import select
+import shutil
+import signal
+import sqlite3
 import sys
+import threading
+import time
+from xml.etree import ElementTree
+import zipfile
+
+# pyarrow is needed for the Parquet sheet cache, the cache is skipped without it. It also
+# writes the Parquet and Arrow output formats.
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# zstandard is needed by pandas to write the csv.zst output format
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# tqdm shows load progress bars, plain progress lines are printed without it
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
 
 ## Details
 __description__ = 'Flattens Cellebrite formatted Excel files. "Contacts" and "Device Info" tabs are required.'
 __author__ = "facelessg00n"
-__version__ = "0.9"
+__version__ = "0.10"
 
 parser = argparse.ArgumentParser(
     description=__description__,
@@ -69,12 +155,54 @@ os.chdir(os.getcwd())
 # Show extra debug output
 debug = False
 
-# Normalise Australian mobile numbers by replacing +614 with 04
+# Write phone numbers in national format, eg. Australian mobiles +614 as 04.
+# phoneCountry selects the rules in countryRules used to resolve numbers.
 ausNormal = True
+phoneCountry = "AU"
 
 # File size warning (MB)
 warnSize = 50
 
+# Stream the Contacts tab in chunks of this many rows, parsers are run on each chunk
+# and outputs are appended to. None loads the whole tab at once.
+chunkSize = None
+
+# Cache parsed sheets as Parquet so later runs on the same export skip the Excel parse.
+# Off unless set, as the cache keeps a copy of the contacts outside the output folder.
+# Least recently used entries are removed when the cache is over cacheLimit MB.
+useCache = False
+cacheDir = ".clbCache"
+cacheLimit = 2048
+
+# Show progress while loading contacts from files over warnSize MB. The GUI can set
+# progressCallback to receive the loadProgress instead.
+showProgress = True
+progressCallback = None
+
+# The GUI can set stepCallback to receive (step, name, done, total) as each file and app is
+# processed, and set cancelEvent to stop processing between files, chunks and apps.
+stepCallback = None
+cancelEvent = None
+
+# Threads writing outputs in the background and the memory in MB the frames waiting to be
+# written may use, see exportWriter. 0 threads writes outputs in the parser's thread.
+exportThreads = 2
+exportBudget = 512
+
+# Format of the app outputs, see outputFile. Parquet and Arrow need pyarrow.
+outputFormats = ["csv", "csv.gz", "csv.zst", "parquet", "arrow"]
+tableFormats = ["parquet", "arrow"]
+outputFormat = "csv"
+
+# Record the time, rows and memory of each stage, see stageProfile
+profileRun = False
+
+# Path of a SQLite database or Parquet folder every contact is also written to, see openStore
+contactStore = None
+
+# Tabs the call and chat participants are read from as well as the contacts, see processParties
+partySheetNames = []
+
 
 # ----------- Logging options -------------------------------------
 
@@ -89,6 +217,8 @@ logging.basicConfig(
 clbPhoneInfo = "Device Info"
 clbContactSheet = "Contacts"
 clbPhoneInfov2 = "Device Information"
+clbCallSheet = "Call Log"
+clbChatSheet = "Chats"
 
 # FIXME
 #### ---- Column names and other options ---------------------------------------------
@@ -114,23 +244,1222 @@ parsedApps = [
     "Zalo",
 ]
 
-
-# Class object to hold phone and input file info
+# Identifiers nested in the Entries column for each app. Maps the entry label prefix to the
+# output column, see extractFields.
+appFields = {
+    "Facebook Messenger": {
+        "User ID-Facebook Id": "Account ID",
+        "User ID-Username": "User Name",
+    },
+    "Instagram": {
+        "User ID-Username": "User Name",
+        "User ID-Instagram Id": "Instagram ID",
+    },
+    "Line": {
+        "User ID-Address Book Name:": "LineAddressBook",
+        "User ID-User ID:": "LineUserID",
+        "User ID-Server:": "LineServerID",
+    },
+    "Signal Private Messenger": {
+        "Phone-:": "Phone",
+        "User ID-:": "User-ID",
+        "User ID-Nickname:": "User-ID-Nickname",
+        "User ID-Username:": "User-ID-Username",
+        "User ID-ProfileKey:": "User-ID-ProfileKey",
+    },
+    "Snapchat": {
+        "User ID-Username": "User Name",
+        "User ID-User ID": "User ID",
+    },
+    "Telegram": {
+        "Phone-": "Phone-Number",
+        "User ID-Peer": "Peer-ID",
+        "User ID-Username": "User-Name",
+    },
+    "Threema": {
+        "User ID-identity:": "Threema ID",
+        "User ID-Username:": "ThreemaUsername",
+    },
+    "WeChat": {
+        "User ID-WeChat ID:": "WeChatID",
+        "User ID-QQ:": "QQ User ID",
+        "User ID-Username:": "Username",
+        "User ID-LinkedIn ID:": "LinkedIn ID",
+        "User ID-Facebook ID:": "Facebook ID",
+    },
+    "WhatsApp": {
+        "Phone-Mobile": "Phone-Mobile",
+        "Phone-:": "Phone",
+        "Phone-Home:": "Phone-Home",
+        "User ID-Push Name": "Push-ID",
+        "User ID-Id": "Id-ID",
+        "User ID-WhatsApp User Id": "WhatsApp-ID",
+        "Web address-Professional": "BusinessWebsite",
+        "Email-Professional": "Business-Email",
+    },
+    "Zalo": {
+        "User ID-User Name:": "ZaloUserName",
+        "User ID-Id:": "ZaloUserID",
+    },
+}
+
+
+# Class object to hold phone and input file info, one is created for each input file
 class phoneData:
-    IMEI = None
-    IMEI2 = None
-    inFile = None
-    inPath = None
-    inProvenance = None
-
     def __init__(
         self, IMEI=None, IMEI2=None, inFile=None, inPath=None, inProvenance=None
     ) -> None:
         self.IMEI = IMEI
         self.IMEI2 = IMEI2
+        self.model = None
+        self.osVersion = None
         self.inFile = inFile
         self.inPath = inPath
+        # Full resolved path of the input file, keys its rows in the contacts store
+        self.inputPath = None
         self.inProvenance = inProvenance
+        # Output files written for this input file and the columns in their header
+        self.outputs = {}
+        # Contacts rows seen for each app
+        self.appCounts = {}
+        self.error = None
+        # Contacts store the outputs are also written to, if any
+        self.store = None
+        # Background writer for the outputs, if any
+        self.writer = None
+        # Open Parquet and Arrow outputs, see tableOutput
+        self.tables = {}
+        # Apps each normalised identifier was found in, for the common contacts index
+        self.identifiers = {}
+        # Stage records when profiling and the stages currently running
+        self.profile = []
+        self.stages = []
+
+
+# Class object to hold an open Excel workbook.
+# The file is opened and indexed once and every sheet is parsed from the same handle
+# with an xlsxReader, rather than decompressing the whole file again for each call to
+# pd.read_excel. With a sheetCache, sheets parsed on an earlier run are loaded from the
+# cache and the Excel file is only opened if a sheet is not cached.
+class clbWorkbook:
+    def __init__(self, inputFile, cache=None, fingerprint=None) -> None:
+        self.inputFile = inputFile
+        self.cache = cache
+        self._xlsx = None
+        self.cacheKey = None
+        self.sheetNames = None
+        if self.cache is not None:
+            self.cacheKey = self.cache.fileKey(inputFile, fingerprint)
+            self.sheetNames = self.cache.loadSheetNames(self.cacheKey)
+        if self.sheetNames is None:
+            self.sheetNames = self.xlsx.sheetNames
+            if self.cache is not None:
+                self.cache.saveSheetNames(self.cacheKey, self.sheetNames)
+
+    @property
+    def xlsx(self):
+        if self._xlsx is None:
+            self._xlsx = xlsxReader(self.inputFile)
+        return self._xlsx
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def hasSheet(self, sheetName):
+        return sheetName in self.sheetNames
+
+    # Raises ValueError if the sheet is missing, the same as pd.read_excel
+    def readSheet(self, sheetName, **kwargs):
+        if not self.hasSheet(sheetName):
+            raise ValueError("Worksheet named '{}' not found".format(sheetName))
+        if self.cache is None:
+            return self._parseSheet(sheetName, **kwargs)
+
+        cacheTag = sheetCache.tag(sheetName, kwargs)
+        cachedParts = self.cache.loadParts(self.cacheKey, cacheTag)
+        if cachedParts is not None:
+            return pd.concat(list(cachedParts))
+        sheetPD = self._parseSheet(sheetName, **kwargs)
+        self.cache.saveParts(self.cacheKey, cacheTag, [sheetPD])
+        return sheetPD
+
+    # Streams a sheet through the xlsxReader, yielding dataframes of at most chunkRows
+    # rows. Only the columns in usecols are kept, either header names or column letters.
+    # A loadProgress can be passed in to report the rows read.
+    def iterSheet(
+        self,
+        sheetName,
+        chunkRows,
+        header=0,
+        index_col=None,
+        usecols=None,
+        progress=None,
+    ):
+        if not self.hasSheet(sheetName):
+            raise ValueError("Worksheet named '{}' not found".format(sheetName))
+        readOptions = {"header": header, "index_col": index_col, "usecols": usecols}
+        if self.cache is None:
+            yield from self._iterRows(sheetName, chunkRows, progress, **readOptions)
+            return
+
+        cacheTag = sheetCache.tag(sheetName, readOptions)
+        cachedParts = self.cache.loadParts(self.cacheKey, cacheTag)
+        if cachedParts is not None:
+            for partPD in cachedParts:
+                for x in range(0, len(partPD), chunkRows):
+                    if progress is not None:
+                        progress.update(len(partPD.iloc[x : x + chunkRows]))
+                    yield partPD.iloc[x : x + chunkRows]
+            return
+
+        # Each chunk is saved as a part of the cache entry, which is only kept if the
+        # whole sheet is read.
+        cacheWriter = self.cache.partWriter(self.cacheKey, cacheTag)
+        try:
+            for chunkPD in self._iterRows(
+                sheetName, chunkRows, progress, **readOptions
+            ):
+                cacheWriter.write(chunkPD)
+                yield chunkPD
+            cacheWriter.commit()
+        finally:
+            cacheWriter.abort()
+
+    def _iterRows(
+        self,
+        sheetName,
+        chunkRows,
+        progress=None,
+        header=0,
+        index_col=None,
+        usecols=None,
+    ):
+        if progress is not None:
+            # Only used for the estimate, some exporters write incorrect dimensions
+            sheetRows = self.xlsx.sheetRows(sheetName)
+            if sheetRows:
+                progress.total = sheetRows - header - 1
+        rows = self.xlsx.iterRows(sheetName, minRow=header + 1)
+
+        headerRow = list(next(rows, []))
+        if isinstance(usecols, str):
+            colIndex = columnLetters(usecols)
+            headerRow.extend([None] * (max(colIndex) + 1 - len(headerRow)))
+            usecols = [
+                "Unnamed: {}".format(x) if headerRow[x] is None else headerRow[x]
+                for x in colIndex
+            ]
+        else:
+            if usecols is None:
+                usecols = [x for x in headerRow if x is not None]
+            missingCols = [x for x in usecols if x not in headerRow]
+            if missingCols:
+                raise ValueError(
+                    "Usecols do not match columns, columns expected but not found: {}".format(
+                        missingCols
+                    )
+                )
+            colIndex = [headerRow.index(x) for x in usecols]
+
+        chunk = []
+        rowsRead = 0
+        for row in rows:
+            rowsRead += 1
+            if progress is not None and rowsRead % 1000 == 0:
+                progress.update(1000)
+            values = [row[x] if x < len(row) else None for x in colIndex]
+            # Skip blank rows
+            if all(x is None for x in values):
+                continue
+            chunk.append(values)
+            if len(chunk) >= chunkRows:
+                yield self._chunkFrame(chunk, usecols, index_col)
+                chunk = []
+        if progress is not None:
+            progress.update(rowsRead % 1000)
+        if chunk:
+            yield self._chunkFrame(chunk, usecols, index_col)
+
+    # Reads a whole sheet into one dataframe
+    def _parseSheet(self, sheetName, header=0, index_col=None, usecols=None):
+        sheetChunks = list(
+            self._iterRows(
+                sheetName,
+                sys.maxsize,
+                header=header,
+                index_col=index_col,
+                usecols=usecols,
+            )
+        )
+        if sheetChunks:
+            return sheetChunks[0]
+        return self._chunkFrame([], usecols, index_col)
+
+    def _chunkFrame(self, chunk, usecols, index_col):
+        chunkPD = pd.DataFrame.from_records(chunk, columns=usecols)
+        if index_col is not None:
+            chunkPD = chunkPD.set_index(index_col)
+        return chunkPD
+
+    def close(self):
+        if self._xlsx is not None:
+            self._xlsx.close()
+
+
+# ------ XLSX reader ----------------------------------------------------------------------------
+# Reads Cellebrite xlsx exports directly from the zip, rather than building openpyxl cell
+# objects for every cell of the sheet. Sheets are streamed with an incremental XML parser
+# and shared strings are resolved from a list read once per workbook. Cell styles are
+# not read, so dates are returned as their serial number, or as their ISO 8601 text for
+# date cells (t="d"). The shared strings list is kept for the life of the reader and is
+# the floor of its memory use, a workbook's strings are not reloaded for each sheet.
+class xlsxReader:
+    relNS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+    def __init__(self, inputFile) -> None:
+        self.zipFile = zipfile.ZipFile(inputFile)
+        self.sheetPaths = self._sheetPaths()
+        self.sharedStrings = []
+        self._stringReader = None
+
+    @property
+    def sheetNames(self):
+        return list(self.sheetPaths)
+
+    # Maps sheet names to their worksheet xml through the workbook relationships
+    def _sheetPaths(self):
+        relsRoot = ElementTree.fromstring(
+            self.zipFile.read("xl/_rels/workbook.xml.rels")
+        )
+        relTargets = {}
+        for rel in relsRoot:
+            target = rel.get("Target").lstrip("/")
+            if not target.startswith("xl/"):
+                target = "xl/" + target
+            relTargets[rel.get("Id")] = target
+
+        workbookRoot = ElementTree.fromstring(self.zipFile.read("xl/workbook.xml"))
+        sheetPaths = {}
+        for sheet in workbookRoot.iter():
+            if sheet.tag.endswith("}sheet"):
+                sheetPaths[sheet.get("name")] = relTargets[
+                    sheet.get("{%s}id" % self.relNS)
+                ]
+        return sheetPaths
+
+    # Shared strings are read as far as the highest index used so far, so reading the
+    # first rows of a sheet does not load every string in the workbook.
+    def _readSharedStrings(self, index):
+        if self._stringReader is None:
+            self._stringReader = self._iterSharedStrings()
+        for x in self._stringReader:
+            self.sharedStrings.append(x)
+            if len(self.sharedStrings) > index:
+                return
+        raise IndexError("Shared string {} not found".format(index))
+
+    def _iterSharedStrings(self):
+        if "xl/sharedStrings.xml" not in self.zipFile.namelist():
+            return
+        with self.zipFile.open("xl/sharedStrings.xml") as f:
+            for event, elem in ElementTree.iterparse(f):
+                if elem.tag.endswith("}si"):
+                    yield stringText(elem)
+                    elem.clear()
+
+    # Number of rows from the sheet dimension, or None if the sheet has none
+    def sheetRows(self, sheetName):
+        return self.sheetDimensions(sheetName)[0]
+
+    # Rows and columns of a sheet from its dimension, (None, None) if it has none
+    def sheetDimensions(self, sheetName):
+        with self.zipFile.open(self.sheetPaths[sheetName]) as f:
+            for event, elem in ElementTree.iterparse(f, events=("start",)):
+                if elem.tag.endswith("}dimension"):
+                    lastCell = elem.get("ref").split(":")[-1]
+                    return (
+                        int("".join(x for x in lastCell if x.isdigit()) or 0),
+                        columnIndex(lastCell) + 1,
+                    )
+                if elem.tag.endswith("}sheetData"):
+                    return None, None
+        return None, None
+
+    # Yields the values of each row from minRow on as a list, with None for empty cells.
+    # Missing rows are yielded as empty lists, the same as openpyxl.
+    def iterRows(self, sheetName, minRow=1):
+        sharedStrings = self.sharedStrings
+        with self.zipFile.open(self.sheetPaths[sheetName]) as f:
+            xmlEvents = ElementTree.iterparse(f, events=("start", "end"))
+            event, root = next(xmlEvents)
+            ns = root.tag[: root.tag.index("}") + 1] if root.tag[0] == "{" else ""
+            sheetDataTag, rowTag, cellTag = ns + "sheetData", ns + "row", ns + "c"
+            valueTag, inlineTag = ns + "v", ns + "is"
+
+            # Rows are removed from sheetData once read so memory use stays flat
+            sheetData = root
+            rowNumber = 0
+            for event, elem in xmlEvents:
+                if event == "start":
+                    if elem.tag == sheetDataTag:
+                        sheetData = elem
+                    continue
+                if elem.tag != rowTag:
+                    continue
+                rowNumber = int(elem.get("r") or rowNumber + 1)
+                if rowNumber < minRow:
+                    sheetData.clear()
+                    continue
+                while minRow < rowNumber:
+                    yield []
+                    minRow += 1
+                minRow += 1
+
+                values = []
+                for cell in elem.iter(cellTag):
+                    cellRef = cell.get("r")
+                    if cellRef:
+                        colIndex = columnIndex(cellRef)
+                        if colIndex > len(values):
+                            values.extend([None] * (colIndex - len(values)))
+                    cellType = cell.get("t")
+                    if cellType == "inlineStr":
+                        inlineValue = cell.find(inlineTag)
+                        values.append(
+                            None if inlineValue is None else stringText(inlineValue)
+                        )
+                        continue
+                    cellValue = cell.findtext(valueTag)
+                    if cellValue is None:
+                        values.append(None)
+                    elif cellType == "s":
+                        stringIndex = int(cellValue)
+                        if stringIndex >= len(sharedStrings):
+                            self._readSharedStrings(stringIndex)
+                        values.append(sharedStrings[stringIndex])
+                    elif cellType in ("str", "e", "d"):
+                        values.append(cellValue)
+                    elif cellType == "b":
+                        values.append(cellValue == "1")
+                    else:
+                        values.append(cellNumber(cellValue))
+                sheetData.clear()
+                yield values
+
+    def close(self):
+        if self._stringReader is not None:
+            self._stringReader.close()
+        self.zipFile.close()
+
+
+# Text of a shared or inline string element, either its text or its rich text runs. The
+# phonetic runs (rPh) are a reading guide for the text and are left out.
+def stringText(elem):
+    texts = []
+    for x in elem:
+        tag = x.tag.rsplit("}", 1)[-1]
+        if tag == "t":
+            texts.append(x.text or "")
+        elif tag == "r":
+            texts.extend(y.text or "" for y in x if y.tag.rsplit("}", 1)[-1] == "t")
+    return "".join(texts)
+
+
+# Zero based column index of a cell reference or column letters, eg. "C5" is 2
+def columnIndex(cellRef):
+    colIndex = 0
+    for x in cellRef:
+        if not x.isalpha():
+            break
+        colIndex = colIndex * 26 + ord(x.upper()) - 64
+    return colIndex - 1
+
+
+# Column indexes of a pandas style usecols string, eg. "B,C,D" or "B:D"
+def columnLetters(usecols):
+    colIndexes = []
+    for colRange in usecols.split(","):
+        first, last = (colRange.split(":") + [colRange])[:2]
+        colIndexes.extend(
+            range(columnIndex(first.strip()), columnIndex(last.strip()) + 1)
+        )
+    return colIndexes
+
+
+def cellNumber(cellValue):
+    try:
+        return int(cellValue)
+    except ValueError:
+        return float(cellValue)
+
+
+# ------ Load progress --------------------------------------------------------------------------
+# Reports rows read, throughput and time remaining while a sheet is streamed. The total is
+# taken from the sheet dimensions so the ETA is an estimate. Progress is shown with tqdm on
+# the command line, or passed to progressCallback if set, eg. by the GUI.
+class loadProgress:
+    def __init__(self, name, callback=None) -> None:
+        self.name = name
+        self.callback = callback
+        self.total = None
+        self.rows = 0
+        self.startTime = time.time()
+        self.lastPrint = self.startTime
+        self.bar = None
+
+    @property
+    def rate(self):
+        return self.rows / max(time.time() - self.startTime, 0.001)
+
+    # Seconds remaining, or None if the total is not known
+    @property
+    def eta(self):
+        if not self.total or not self.rows:
+            return None
+        return max(self.total - self.rows, 0) / self.rate
+
+    def update(self, rows):
+        self.rows += rows
+        if self.callback is not None:
+            self.callback(self)
+        elif tqdm is not None:
+            if self.bar is None:
+                self.bar = tqdm(
+                    total=self.total, desc=self.name, unit="rows", unit_scale=True
+                )
+            self.bar.update(rows)
+        elif time.time() - self.lastPrint > 5:
+            self.lastPrint = time.time()
+            print(self.status())
+
+    def status(self):
+        progressText = "{} : {} rows".format(self.name, self.rows)
+        if self.total:
+            progressText += " of {}".format(self.total)
+        progressText += ", {:.0f} rows/s".format(self.rate)
+        if self.eta is not None:
+            progressText += ", {:.0f}:{:02.0f} remaining".format(*divmod(self.eta, 60))
+        return progressText
+
+    def close(self):
+        if self.bar is not None:
+            self.bar.close()
+        logging.info(
+            "Loaded {} rows from {} in {:.1f}s".format(
+                self.rows, self.name, time.time() - self.startTime
+            )
+        )
+
+
+class processCancelled(Exception):
+    pass
+
+
+def reportStep(step, name, done, total):
+    if stepCallback is not None:
+        stepCallback(step, name, done, total)
+
+
+def isCancelled():
+    return cancelEvent is not None and cancelEvent.is_set()
+
+
+def checkCancelled():
+    if isCancelled():
+        raise processCancelled("Processing cancelled")
+
+
+# ------ Profiling ------------------------------------------------------------------------------
+# With profileRun set each stage of a file's processing records its wall time, CPU time,
+# rows in and out and peak memory to phone.profile. Stages can be nested, eg. an app parser
+# inside the file total, and rows exported count as rows out of every open stage.
+class stageProfile:
+    def __init__(self, phone, stage, rowsIn=None) -> None:
+        self.phone = phone
+        self.stage = stage
+        self.rowsIn = rowsIn
+        self.rowsOut = 0
+        self.childPeak = 0
+
+    def __enter__(self):
+        if profileRun:
+            resetPeakMemory()
+            self.phone.stages.append(self)
+            self.startTime = time.perf_counter()
+            self.startCPU = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        if not profileRun:
+            return
+        peakMB = max(peakMemory() or 0, self.childPeak)
+        self.phone.stages.remove(self)
+        # The peak was reset for this stage, so pass it up to the stage it ran inside
+        if self.phone.stages:
+            self.phone.stages[-1].childPeak = max(
+                self.phone.stages[-1].childPeak, peakMB
+            )
+        self.phone.profile.append(
+            {
+                "inputFile": self.phone.inFile,
+                "stage": self.stage,
+                "seconds": round(time.perf_counter() - self.startTime, 3),
+                "cpuSeconds": round(time.process_time() - self.startCPU, 3),
+                "rowsIn": self.rowsIn,
+                "rowsOut": self.rowsOut,
+                "peakMB": peakMB or None,
+            }
+        )
+
+
+def addRowsOut(phone, rows):
+    for x in phone.stages:
+        x.rowsOut += rows
+
+
+# Peak memory is read from /proc on Linux, where it can be reset for each stage, otherwise
+# getrusage gives the peak for the whole process.
+def resetPeakMemory():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peakMemory():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+
+        peakRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS and KB elsewhere
+        return round(peakRSS / (1048576 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        return None
+
+
+# Saves a file's profile as {inFile}-PROFILE.json and .csv next to its outputs
+def writeProfile(phone):
+    with open("{}-PROFILE.json".format(phone.inFile), "w") as f:
+        json.dump(phone.profile, f, indent=1)
+    profilePD = pd.DataFrame(phone.profile)
+    profilePD["rowsIn"] = profilePD["rowsIn"].astype("Int64")
+    profilePD.to_csv("{}-PROFILE.csv".format(phone.inFile), index=False)
+
+
+# Rolls the profiles of a bulk run up to a total for each file and each stage, saved to
+# clbExtract-profile.json and clbExtract-profile.csv
+def writeProfileSummary(profiles):
+    profilePD = pd.DataFrame(profiles)
+    if profilePD.empty:
+        return
+    profilePD["rowsIn"] = profilePD["rowsIn"].astype("Int64")
+    stageTotals = profilePD.groupby("stage", sort=False).agg(
+        files=("inputFile", "nunique"),
+        seconds=("seconds", "sum"),
+        cpuSeconds=("cpuSeconds", "sum"),
+        rowsIn=("rowsIn", "sum"),
+        rowsOut=("rowsOut", "sum"),
+        peakMB=("peakMB", "max"),
+    )
+    fileTotals = profilePD[profilePD["stage"] == "total"].set_index("inputFile")
+    stagesPD = profilePD[profilePD["stage"] != "total"]
+    slowestStages = stagesPD.loc[stagesPD.groupby("inputFile")["seconds"].idxmax()]
+    fileTotals = fileTotals.join(
+        slowestStages.set_index("inputFile")[["stage", "seconds"]].rename(
+            columns={"stage": "slowestStage", "seconds": "slowestSeconds"}
+        )
+    ).drop(columns="stage")
+    fileTotals = fileTotals.sort_values("seconds", ascending=False)
+
+    with open("clbExtract-profile.json", "w") as f:
+        json.dump(
+            {
+                "files": fileTotals.reset_index().to_dict(orient="records"),
+                "stages": stageTotals.reset_index().to_dict(orient="records"),
+            },
+            f,
+            indent=1,
+            default=str,
+        )
+    fileTotals.to_csv("clbExtract-profile.csv")
+    print("\nSlowest files")
+    for inputFile, row in fileTotals.head(5).iterrows():
+        print(
+            "{} : {}s, {} MB peak, slowest stage {}".format(
+                inputFile, row["seconds"], row["peakMB"], row["slowestStage"]
+            )
+        )
+
+
+# ------ Parquet cache of parsed sheets ------------------------------------------------------
+# Sheets are cached under a key made from sheetCacheVersion and the path, size, modified
+# time and SHA-256 of the input file. Each cached sheet is a folder of Parquet parts, one per chunk when streaming.
+# Entries are touched when used and the least recently used are removed once the cache
+# is over cacheLimit MB. Files are written to a temp name and renamed, so pool workers
+# can share the cache.
+# Raise when the xlsx reader or the frames it returns change, so sheets cached by an earlier
+# version are read again
+sheetCacheVersion = 1
+
+
+class sheetCache:
+    def __init__(self, cacheDir, limitMB) -> None:
+        self.cacheDir = cacheDir
+        self.limitBytes = limitMB * 1048576
+        os.makedirs(self.cacheDir, exist_ok=True)
+
+    # The file is only hashed if its fingerprint is not passed in
+    def fileKey(self, inputFile, fingerprint=None):
+        if fingerprint is None:
+            fingerprint = fileFingerprint(inputFile)
+        fileKey = hashlib.sha256(
+            "{}|{}|{}|{}|{}".format(
+                sheetCacheVersion,
+                os.path.abspath(inputFile),
+                fingerprint["size"],
+                fingerprint["mtime"],
+                fingerprint["sha256"],
+            ).encode()
+        )
+        return fileKey.hexdigest()[:32]
+
+    # Cache names for a sheet and the options it was read with
+    @staticmethod
+    def tag(sheetName, readOptions):
+        optionHash = hashlib.sha256(repr(sorted(readOptions.items())).encode())
+        sheetTag = "".join(x if x.isalnum() else "_" for x in sheetName)
+        return "{}-{}".format(sheetTag, optionHash.hexdigest()[:8])
+
+    def loadSheetNames(self, cacheKey):
+        namesFile = os.path.join(self.cacheDir, "{}.json".format(cacheKey))
+        try:
+            with open(namesFile) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def saveSheetNames(self, cacheKey, sheetNames):
+        namesFile = os.path.join(self.cacheDir, "{}.json".format(cacheKey))
+        tempFile = "{}.tmp-{}".format(namesFile, os.getpid())
+        with open(tempFile, "w") as f:
+            json.dump(list(sheetNames), f)
+        os.replace(tempFile, namesFile)
+
+    # Returns an iterator of the cached parts, or None if the sheet is not cached
+    def loadParts(self, cacheKey, cacheTag):
+        entryDir = os.path.join(self.cacheDir, "{}-{}".format(cacheKey, cacheTag))
+        if not os.path.isdir(entryDir):
+            return None
+        os.utime(entryDir)
+        logging.info("Loading {} from cache".format(cacheTag))
+        partFiles = sorted(glob.glob(os.path.join(entryDir, "part-*.parquet")))
+        return (pd.read_parquet(x) for x in partFiles)
+
+    def saveParts(self, cacheKey, cacheTag, parts):
+        cacheWriter = self.partWriter(cacheKey, cacheTag)
+        try:
+            for partPD in parts:
+                cacheWriter.write(partPD)
+            cacheWriter.commit()
+        finally:
+            cacheWriter.abort()
+
+    def partWriter(self, cacheKey, cacheTag):
+        return cachePartWriter(self, cacheKey, cacheTag)
+
+    # Remove least recently used entries until the cache is under the size limit
+    def evict(self, keepKey=None):
+        entries = {}
+        for entryName in os.listdir(self.cacheDir):
+            entryPath = os.path.join(self.cacheDir, entryName)
+            if ".tmp-" in entryName:
+                continue
+            cacheKey = entryName.split("-")[0].split(".")[0]
+            entry = entries.setdefault(cacheKey, {"size": 0, "used": 0, "paths": []})
+            entry["size"] += pathSize(entryPath)
+            entry["used"] = max(entry["used"], os.path.getmtime(entryPath))
+            entry["paths"].append(entryPath)
+
+        totalSize = sum(x["size"] for x in entries.values())
+        for cacheKey, entry in sorted(entries.items(), key=lambda x: x[1]["used"]):
+            if totalSize <= self.limitBytes:
+                break
+            if cacheKey == keepKey:
+                continue
+            logging.info("Removing {} from cache".format(cacheKey))
+            for entryPath in entry["paths"]:
+                removePath(entryPath)
+            totalSize -= entry["size"]
+
+    def purge(self):
+        for entryName in os.listdir(self.cacheDir):
+            removePath(os.path.join(self.cacheDir, entryName))
+
+
+# Writes the parts of one cache entry to a temp folder, renamed into place by commit
+class cachePartWriter:
+    def __init__(self, cache, cacheKey, cacheTag) -> None:
+        self.cache = cache
+        self.cacheKey = cacheKey
+        self.entryDir = os.path.join(cache.cacheDir, "{}-{}".format(cacheKey, cacheTag))
+        self.tempDir = "{}.tmp-{}".format(self.entryDir, os.getpid())
+        self.partCount = 0
+        os.makedirs(self.tempDir, exist_ok=True)
+
+    def write(self, partPD):
+        partFile = os.path.join(
+            self.tempDir, "part-{:05d}.parquet".format(self.partCount)
+        )
+        parquetFrame(partPD).to_parquet(partFile)
+        self.partCount += 1
+
+    def commit(self):
+        removePath(self.entryDir)
+        os.replace(self.tempDir, self.entryDir)
+        self.cache.evict(keepKey=self.cacheKey)
+
+    # Removes the temp folder if the entry was not committed
+    def abort(self):
+        removePath(self.tempDir)
+
+
+# Parquet columns must hold a single type, cells mixing text and numbers are stored as text
+def parquetFrame(framePD):
+    framePD = framePD.copy()
+    for x in framePD.columns:
+        if framePD[x].dtype == object and pd.api.types.infer_dtype(
+            framePD[x], skipna=True
+        ).startswith("mixed"):
+            framePD[x] = framePD[x].map(lambda y: y if pd.isna(y) else str(y))
+    return framePD
+
+
+def fileSha256(inputFile):
+    fileHash = hashlib.sha256()
+    with open(inputFile, "rb") as f:
+        for block in iter(lambda: f.read(1048576), b""):
+            fileHash.update(block)
+    return fileHash.hexdigest()
+
+
+def pathSize(inputPath):
+    if os.path.isdir(inputPath):
+        return sum(
+            os.path.getsize(os.path.join(root, x))
+            for root, dirs, files in os.walk(inputPath)
+            for x in files
+        )
+    return os.path.getsize(inputPath)
+
+
+def removePath(inputPath):
+    if os.path.isdir(inputPath):
+        shutil.rmtree(inputPath, ignore_errors=True)
+    elif os.path.exists(inputPath):
+        os.remove(inputPath)
+
+
+# Returns the sheet cache if enabled and pyarrow is available
+def openCache():
+    if not useCache:
+        return None
+    if pyarrow is None:
+        logging.info("pyarrow not installed, sheet cache disabled")
+        return None
+    return sheetCache(cacheDir, cacheLimit)
+
+
+# ------ Contacts store -------------------------------------------------------------------------
+# Every exported contact detail can also be written to one normalised table, keyed by device
+# and app, so a bulk run produces a single store instead of a CSV per app per device.
+# The store is a SQLite database if contactStore ends in .db, .sqlite or .sqlite3, otherwise
+# it is a Parquet dataset partitioned by originIMEI and Source. Rows are replaced by input
+# file, keyed on inputPath, its full resolved path, as case folders can hold files of the
+# same name.
+storeColumns = [
+    originIMEI,
+    "inputFile",
+    "Provenance",
+    "Source",
+    "Account",
+    "Name",
+    contactTypeOutput,
+    contactOutput,
+    "inputPath",
+]
+
+# Columns of an app's output which describe the contact rather than hold its details
+storeIdColumns = [
+    originIMEI,
+    "inputFile",
+    "Provenance",
+    "Source",
+    "source",
+    "Account",
+    "Name",
+    "Interaction Statuses",
+    "Sheet",
+    "Row",
+    "Role",
+    "Owner",
+]
+
+
+class sqliteStore:
+    def __init__(self, storePath) -> None:
+        # Pool workers write to the same database, wait for the others to commit
+        self.connection = sqlite3.connect(storePath, timeout=300)
+        with self.connection:
+            # Taken first so workers create or update the table one at a time
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS contacts ({})".format(
+                    ", ".join('"{}" TEXT'.format(x) for x in storeColumns)
+                )
+            )
+            # Stores written by earlier versions lack the newer columns
+            tableColumns = [
+                x[1] for x in self.connection.execute("PRAGMA table_info(contacts)")
+            ]
+            for x in storeColumns:
+                if x not in tableColumns:
+                    self.connection.execute(
+                        'ALTER TABLE contacts ADD COLUMN "{}" TEXT'.format(x)
+                    )
+            for x in [contactOutput, originIMEI, "Source", "inputPath"]:
+                self.connection.execute(
+                    'CREATE INDEX IF NOT EXISTS "contacts_{0}" ON contacts ("{0}")'.format(
+                        x
+                    )
+                )
+
+    # Remove rows from an earlier run on the same input file
+    def clearFile(self, inFile, inputPath):
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM contacts WHERE inputPath = ?", (inputPath,)
+            )
+
+    # Each batch is written in a single transaction
+    def write(self, storePD):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO contacts ({}) VALUES ({})".format(
+                    ", ".join('"{}"'.format(x) for x in storeColumns),
+                    ", ".join("?" for x in storeColumns),
+                ),
+                storePD.itertuples(index=False, name=None),
+            )
+
+    def close(self):
+        self.connection.close()
+
+
+class parquetStore:
+    def __init__(self, storePath) -> None:
+        self.storePath = storePath
+        self.batchCount = 0
+        os.makedirs(self.storePath, exist_ok=True)
+
+    # Remove parts from an earlier run on the same input file. Parts are named
+    # {inFile}-{pathKey}-{pid}-{batch}-{i}.parquet, the name must match exactly as another
+    # input file can start with the same name, eg. dev1-old.
+    def clearFile(self, inFile, inputPath):
+        fileName = "{}-{}".format(inFile, self.pathKey(inputPath))
+        partName = re.compile(r"{}-\d+-\d+-\d+\.parquet".format(re.escape(fileName)))
+        for x in glob.glob(
+            os.path.join(
+                glob.escape(self.storePath),
+                "*",
+                "*",
+                "{}-*.parquet".format(glob.escape(fileName)),
+            )
+        ):
+            if partName.fullmatch(os.path.basename(x)):
+                os.remove(x)
+
+    # Short hash of an input file's full path, so files of the same name in different
+    # folders have their own parts
+    @staticmethod
+    def pathKey(inputPath):
+        return hashlib.sha256(str(inputPath).encode()).hexdigest()[:12]
+
+    # Each batch is written as a part file in each device and app partition
+    def write(self, storePD):
+        storePD.to_parquet(
+            self.storePath,
+            partition_cols=[originIMEI, "Source"],
+            basename_template="{}-{}-{}-{}-{{i}}.parquet".format(
+                storePD["inputFile"].iloc[0],
+                self.pathKey(storePD["inputPath"].iloc[0]),
+                os.getpid(),
+                self.batchCount,
+            ),
+            index=False,
+        )
+        self.batchCount += 1
+
+    def close(self):
+        pass
+
+
+# Returns the contacts store for a phoneData's input file if one is set
+def openStore(phone, clear=True):
+    if contactStore is None:
+        return None
+    if Path(contactStore).suffix.lower() in [".db", ".sqlite", ".sqlite3"]:
+        store = sqliteStore(contactStore)
+    elif pyarrow is None:
+        logging.warning("pyarrow not installed, contacts store not written")
+        return None
+    else:
+        store = parquetStore(contactStore)
+    if clear:
+        store.clearFile(phone.inFile, phone.inputPath)
+    return store
+
+
+# Normalises an app's output into one row per contact detail
+def storeFrame(outputPD, outputName, phone):
+    outputPD = outputPD.rename(columns=str)
+    idCols = [x for x in outputPD.columns if x in storeIdColumns]
+    detailCols = [x for x in outputPD.columns if x not in storeIdColumns]
+    storePD = outputPD.melt(
+        id_vars=idCols,
+        value_vars=detailCols,
+        var_name=contactTypeOutput,
+        value_name=contactOutput,
+    )
+    storePD = storePD[storePD[contactOutput].notna() & (storePD[contactOutput] != "")]
+
+    # The app is named the same as its output file, eg. dev1-WHATSAPP.csv is WHATSAPP
+    storePD["Source"] = outputName[len(phone.inFile) + 1 : -len(".csv")]
+    storePD[originIMEI] = constantColumn(phone.IMEI, len(storePD))
+    storePD["inputFile"] = constantColumn(phone.inFile, len(storePD))
+    storePD["Provenance"] = constantColumn(phone.inProvenance, len(storePD))
+    storePD["inputPath"] = constantColumn(phone.inputPath, len(storePD))
+    storePD = storePD.reindex(columns=storeColumns)
+    for x in storeColumns:
+        values = storePD[x].astype("string").str.strip()
+        storePD[x] = values.astype(object).where(values.notna(), None)
+    return storePD
+
+
+# ------ Processed files manifest ---------------------------------------------------------------
+# Records the size, modified time, SHA-256, parser version and outputs of each file a bulk
+# run completed, so later runs only process new or changed files.
+manifestFile = "clbExtract-manifest.json"
+
+
+def loadManifest(folder="."):
+    try:
+        with open(os.path.join(folder, manifestFile)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def saveManifest(manifest, folder="."):
+    tempFile = os.path.join(folder, "{}.tmp".format(manifestFile))
+    with open(tempFile, "w") as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(tempFile, os.path.join(folder, manifestFile))
+
+
+def fileFingerprint(inputFile):
+    fileStat = os.stat(inputFile)
+    return {
+        "size": fileStat.st_size,
+        "mtime": fileStat.st_mtime_ns,
+        "sha256": fileSha256(inputFile),
+    }
+
+
+# Options that change what is written for a file, recorded in its manifest entry
+def manifestOptions():
+    return {
+        "format": outputFormat,
+        "sheets": partySheetNames,
+        "store": contactStore,
+        "country": phoneCountry,
+        "ausNormal": ausNormal,
+    }
+
+
+# A file is unchanged if it was processed by this version with the same options and its
+# outputs still exist in folder. The file is only hashed if its size matches but the
+# modified time does not.
+def fileUnchanged(inputFile, entry, folder="."):
+    if entry is None or entry["version"] != __version__:
+        return False
+    if any(entry.get(x) != y for x, y in manifestOptions().items()):
+        return False
+    if not all(os.path.exists(os.path.join(folder, x)) for x in entry["outputs"]):
+        return False
+    fileStat = os.stat(inputFile)
+    if fileStat.st_size != entry["size"]:
+        return False
+    if fileStat.st_mtime_ns == entry["mtime"]:
+        return True
+    return fileSha256(inputFile) == entry["sha256"]
+
+
+# ------ Common contacts index ------------------------------------------------------------------
+# Inverted index from a normalised identifier (phone number, user ID, etc.) to the devices,
+# input files and apps it was found in. Built during bulk runs and saved to
+# commonIndexFile, so identifiers seen on more than one device can be listed without
+# merging the CSV outputs.
+commonIndexFile = "clbExtract-index.json"
+commonReportFile = "clbExtract-common.csv"
+# Set during bulk runs, the only runs that update the index
+indexRun = False
+
+
+# Phone numbers are keyed by their E.164 form so different formatting still matches,
+# other identifiers are compared case insensitively. Only the details in phones are read as
+# phone numbers, a numeric user ID could otherwise pass for a number under some country
+# rules, eg. any 10 digits with US rules.
+def normaliseIdentifiers(details, phones=None):
+    details = details.astype(str).str.strip()
+    keys = details.str.lower()
+    e164 = normalisePhones(details if phones is None else details[phones])["E164"]
+    e164 = e164.reindex(keys.index)
+    return keys.mask(e164.notna(), e164)
+
+
+def normaliseIdentifier(value):
+    return normaliseIdentifiers(pd.Series([value])).iloc[0]
+
+
+# Contact types holding phone numbers, eg. Phone-Mobile or E164. The Entries of the Native
+# and Recents outputs are phone numbers too, as are the party Identifiers that have an E164,
+# so a party's number is keyed once rather than again as its formatted text.
+phoneContactTypes = re.compile(r"phone|e164|national", re.IGNORECASE)
+phoneDetailOutputs = {
+    "NATIVE": "Entries",
+    "RECENTS": "Entries",
+    "PARTIES": "Identifier",
+}
+
+
+# Identifiers in a normalised store frame, added to the phoneData for the input file
+def indexContacts(storePD, phone):
+    contactTypes = storePD[contactTypeOutput].astype(str)
+    phones = contactTypes.str.contains(phoneContactTypes) | (
+        contactTypes == storePD["Source"].map(phoneDetailOutputs)
+    )
+    identifiers = normaliseIdentifiers(storePD[contactOutput], phones)
+    for app, identifier in zip(storePD["Source"], identifiers):
+        if identifier:
+            phone.identifiers.setdefault(identifier, set()).add(app)
+
+
+def loadIndex():
+    try:
+        with open(commonIndexFile) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# Replaces the index entries of the input files in a bulk run with their new identifiers
+def updateIndex(summaries, fileIdentifiers):
+    commonIndex = loadIndex()
+    for identifier in list(commonIndex):
+        commonIndex[identifier] = [
+            x for x in commonIndex[identifier] if x[1] not in fileIdentifiers
+        ]
+        if not commonIndex[identifier]:
+            del commonIndex[identifier]
+
+    for summary in summaries:
+        identifiers = fileIdentifiers.get(summary["inputFile"], {})
+        # IMEIs read from Excel can be numbers
+        imei = None if pd.isna(summary.get("IMEI")) else str(summary["IMEI"])
+        for identifier, apps in identifiers.items():
+            commonIndex.setdefault(identifier, []).extend(
+                [imei, summary["inputFile"], x] for x in sorted(apps)
+            )
+
+    tempFile = "{}.tmp".format(commonIndexFile)
+    with open(tempFile, "w") as f:
+        json.dump(commonIndex, f)
+    os.replace(tempFile, commonIndexFile)
+    logging.info(
+        "Common contacts index updated, {} identifiers".format(len(commonIndex))
+    )
+    return commonIndex
+
+
+# Identifiers found on at least minDevices devices, most shared first. Files without an
+# IMEI are counted as a device each.
+def commonContacts(commonIndex, minDevices=2):
+    rows = []
+    for identifier, entries in commonIndex.items():
+        devices = {
+            str(imei) if imei is not None else inputFile
+            for imei, inputFile, app in entries
+        }
+        if len(devices) < minDevices:
+            continue
+        rows.append(
+            {
+                "Identifier": identifier,
+                "Devices": len(devices),
+                "Files": len({x[1] for x in entries}),
+                "Apps": ", ".join(sorted({x[2] for x in entries})),
+                originIMEI: ", ".join(sorted(devices)),
+                "inputFiles": ", ".join(sorted({x[1] for x in entries})),
+            }
+        )
+    reportPD = pd.DataFrame(
+        rows,
+        columns=["Identifier", "Devices", "Files", "Apps", originIMEI, "inputFiles"],
+    )
+    return reportPD.sort_values(
+        ["Devices", "Files", "Identifier"], ascending=[False, False, True]
+    )
+
+
+# Report mode, saves the shared identifiers to commonReportFile
+def commonReport(minDevices=2):
+    commonIndex = loadIndex()
+    if not commonIndex:
+        print("No common contacts index found, run a bulk process first")
+        return
+    reportPD = commonContacts(commonIndex, minDevices)
+    print(
+        "{} identifiers found on {} or more devices".format(len(reportPD), minDevices)
+    )
+    for row in reportPD.head(20).itertuples(index=False):
+        print("{} : {} devices - {}".format(row.Identifier, row.Devices, row.Apps))
+    reportPD.to_csv(commonReportFile, index=False)
+    print("Saved to {}".format(commonReportFile))
+    logging.info("Common contacts report saved to {}".format(commonReportFile))
+
+
+# Query mode, lists where one identifier was found
+def queryIndex(value):
+    # The value could be a phone number or another identifier made of digits
+    commonIndex = loadIndex()
+    entries = commonIndex.get(normaliseIdentifier(value)) or commonIndex.get(
+        str(value).strip().lower(), []
+    )
+    print("{} found in {} places".format(value, len(entries)))
+    for imei, inputFile, app in entries:
+        print("{} : {} - {}".format(imei, inputFile, app))
+    return entries
 
 
 # -------------Functions live here ------------------------------------------
@@ -138,153 +1467,849 @@ class phoneData:
 # ----- Bulk Excel Processor--------------------------------------------------
 
 
+# The excel files in the working directory
+def bulkInputFiles():
+    return glob.glob("*.xlsx") + glob.glob("*.XLSX")
+
+
 # Finds and processes all excel files in the working directory.
-def bulkProcessor(inputProvenance):
+# If workers is more than 1 the files are processed in parallel in a pool of processes.
+# Files completed by an earlier run are skipped if unchanged, unless fullRun is set.
+def bulkProcessor(inputProvenance, workers=None, fullRun=False, resume=False):
+    global journalRun, indexRun
     FILE_PATH = os.getcwd()
-    inputFiles = glob.glob("*.xlsx") + glob.glob("*.XLSX")
+    inputFiles = bulkInputFiles()
     print((str(len(inputFiles)) + " Excel files located. \n"))
     logging.info("Bulk processing {} files".format(str(len(inputFiles))))
-    # If there are no files found exit the process.
+    # If there are no files found there is nothing to process.
     if len(inputFiles) == 0:
         print("No excel files located.")
         print("Exiting.")
-        quit()
+        return
     else:
-        for inputFile in inputFiles:
-            if os.path.exists(inputFile):
-                try:
-                    processMetadata(inputFile, inputProvenance)
-                # Need to deal with $ files.
-                except FileNotFoundError:
-                    print("File does not exist or temp file detected")
-                    pass
+        inputFiles = [x for x in inputFiles if os.path.exists(x)]
+        manifest = loadManifest()
+        unchangedFiles = []
+        if not fullRun:
+            unchangedFiles = [
+                x for x in inputFiles if fileUnchanged(x, manifest.get(x))
+            ]
+        if unchangedFiles:
+            print("Skipping {} unchanged files".format(len(unchangedFiles)))
+            logging.info("Skipping {} unchanged files".format(len(unchangedFiles)))
+        pendingFiles = [x for x in inputFiles if x not in unchangedFiles]
+
+        resumedFiles = {}
+        if resume:
+            resumedFiles = {
+                x: y
+                for x, y in loadJournal().items()
+                if x in pendingFiles and fileUnchanged(x, y["manifest"])
+            }
+            print("Resuming, {} files already complete".format(len(resumedFiles)))
+            logging.info(
+                "Resuming, {} files already complete".format(len(resumedFiles))
+            )
+            pendingFiles = [x for x in pendingFiles if x not in resumedFiles]
+        else:
+            removePath(journalFile)
+        removePartFiles()
+        journalRun = True
+        indexRun = True
+        journalEvent("run", files=pendingFiles, resume=resume)
+        fileFeatures = {x: workbookFeatures(x) for x in pendingFiles}
+
+        if (workers and workers > 1) or fileTimeout:
+            samples = loadMemorySamples()
+            estimates = {
+                x: estimateMemory(fileFeatures[x], samples) for x in pendingFiles
+            }
+            summaries = processPool(
+                pendingFiles, inputProvenance, workers or 1, estimates
+            )
+        else:
+            summaries = []
+            for x in pendingFiles:
+                if isCancelled():
+                    break
+                reportStep("file", x, len(summaries), len(pendingFiles))
+                journalEvent("start", inputFile=x)
+                summaries.append(processFile(x, inputProvenance))
+                journalSummary(summaries[-1])
+            reportStep("file", None, len(summaries), len(pendingFiles))
+        closeAppPool()
+        journalRun = False
+        indexRun = False
+        summaries = summaries + [
+            {x: y for x, y in entry.items() if x not in ["event", "time"]}
+            for entry in resumedFiles.values()
+        ]
+        fileIdentifiers = {x["inputFile"]: x.pop("identifiers", {}) for x in summaries}
+        profiles = [y for x in summaries for y in x.pop("profile", [])]
+        calibrateMemory(summaries, fileFeatures)
+        for summary in summaries:
+            manifestEntry = summary.pop("manifest", None)
+            if summary["status"] == "complete":
+                manifest[summary["inputFile"]] = dict(manifestEntry, summary=summary)
+            else:
+                manifest.pop(summary["inputFile"], None)
+        saveManifest(manifest)
+
+        summaries = summaries + [
+            dict(manifest[x]["summary"], status="unchanged", seconds=0)
+            for x in unchangedFiles
+        ]
+        writeSummary(summaries)
+        if profileRun:
+            writeProfileSummary(profiles)
+        updateIndex(summaries, fileIdentifiers)
+        commonReport()
     if debug:
         for inputFile in inputFiles:
             inputFilename = inputFile.split(".")[0]
             print(inputFilename)
 
 
+# Processes one input file and returns a summary of the result for the bulk processor.
+def processFile(inputFile, inputProvenance):
+    startTime = time.time()
+    summary = {
+        "inputFile": inputFile,
+        "status": "complete",
+        "IMEI": None,
+        "IMEI2": None,
+        "model": None,
+        "osVersion": None,
+        "contacts": 0,
+        "apps": None,
+        "outputs": 0,
+        "seconds": None,
+        "peakMB": None,
+        "error": None,
+    }
+    resetPeakMemory()
+    try:
+        # Hashed once for the manifest and the sheet cache
+        fingerprint = fileFingerprint(inputFile)
+        phone = processMetadata(inputFile, inputProvenance, fingerprint)
+        summary["IMEI"] = phone.IMEI
+        summary["IMEI2"] = phone.IMEI2
+        summary["model"] = phone.model
+        summary["osVersion"] = phone.osVersion
+        summary["contacts"] = sum(phone.appCounts.values())
+        summary["apps"] = ", ".join(phone.appCounts)
+        summary["outputs"] = len(phone.outputs)
+        summary["identifiers"] = phone.identifiers
+        summary["profile"] = phone.profile
+        summary["manifest"] = dict(
+            fingerprint,
+            version=__version__,
+            outputs=list(phone.outputs),
+            **manifestOptions(),
+        )
+        if phone.error is not None:
+            summary["status"] = "failed"
+            summary["error"] = phone.error
+    # Need to deal with $ files.
+    except FileNotFoundError:
+        print("File does not exist or temp file detected")
+        summary["status"] = "skipped"
+    except processCancelled:
+        print("Processing {} cancelled".format(inputFile))
+        logging.info("Processing {} cancelled".format(inputFile))
+        summary["status"] = "cancelled"
+    except Exception as e:
+        print("\033[1;31m Processing {} failed - {}\033[0m".format(inputFile, e))
+        logging.exception("Processing {} failed".format(inputFile))
+        summary["status"] = "failed"
+        summary["error"] = str(e)
+    summary["seconds"] = round(time.time() - startTime, 2)
+    summary["peakMB"] = peakMemory()
+    return summary
+
+
+# ------ Run journal ----------------------------------------------------------------------------
+# A bulk run appends each file started and completed, and each app parsed, to journalFile as
+# it goes. Files completed by an interrupted run are skipped by --resume, their summaries
+# and identifiers are read back from the journal. A file is always resumed from its start,
+# as its outputs are only renamed into place once the whole file is complete.
+journalFile = "clbExtract-journal.jsonl"
+journalRun = False
+
+
+def journalEvent(event, **fields):
+    if not journalRun:
+        return
+    with open(journalFile, "a") as f:
+        f.write(json.dumps(dict(fields, event=event, time=time.time()), default=str))
+        f.write("\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# Returns the journal entries of the files the journaled run completed
+def loadJournal():
+    completedFiles = {}
+    try:
+        with open(journalFile) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line is cut short if the run died while writing it
+                    continue
+                if entry["event"] == "file" and entry["status"] == "complete":
+                    entry["identifiers"] = {
+                        x: set(y) for x, y in entry.get("identifiers", {}).items()
+                    }
+                    completedFiles[entry["inputFile"]] = entry
+    except FileNotFoundError:
+        pass
+    return completedFiles
+
+
+# The apps of each identifier are a set, saved as a sorted list
+def journalSummary(summary):
+    identifiers = {x: sorted(y) for x, y in summary.get("identifiers", {}).items()}
+    journalEvent("file", **dict(summary, identifiers=identifiers))
+
+
+# Outputs are written to a .part file and renamed when the input file is complete, so an
+# interrupted run never leaves a truncated output.
+def partFile(fileName):
+    return "{}.part".format(fileName)
+
+
+# Removes the outputs left by an input file that did not complete, or by every file. The
+# outputs of one file are those it journaled, as another file's outputs can start with the
+# same name, eg. dev1-2-NATIVE.csv for dev1-2.xlsx while dev1.xlsx is processed.
+def removePartFiles(inputFile=None):
+    if inputFile is None:
+        partFiles = glob.glob(partFile("*-*"))
+    else:
+        partFiles = [
+            y
+            for x in journalOutputs(Path(inputFile).stem)
+            for y in glob.glob("{}.*part*".format(glob.escape(x)))
+        ]
+    for x in partFiles:
+        removePath(x)
+
+
+# Outputs the journal recorded an input file starting
+def journalOutputs(inFile):
+    outputs = []
+    try:
+        with open(journalFile) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["event"] == "output" and entry["inputFile"] == inFile:
+                    outputs.append(entry["output"])
+    except FileNotFoundError:
+        pass
+    return outputs
+
+
+# ------ Memory scheduling ----------------------------------------------------------------------
+# With maxMemory set the pool only starts a file while the estimated peak memory of the
+# running files stays under maxMemory MB, largest files first. A file's peak is estimated
+# from the cells in its Contacts tab, or its size if the tab has no dimension, and
+# calibrated from the peaks of earlier bulk runs kept in memoryFile.
+maxMemory = None
+memoryFile = "clbExtract-memory.json"
+memorySamples = 100
+
+# Estimates used until there are runs to calibrate from. Only files of at least
+# calibrationMB are used to calibrate the per cell and per MB rates, smaller files are
+# mostly the interpreter itself.
+memoryBase = 250
+memoryPerCell = 0.0004
+memoryPerFileMB = 60
+calibrationMB = 1
+
+
+def workbookFeatures(inputFile):
+    features = {"fileMB": os.path.getsize(inputFile) / 1048576, "cells": None}
+    try:
+        xlsx = xlsxReader(inputFile)
+        try:
+            rows, columns = xlsx.sheetDimensions(clbContactSheet)
+            if rows and columns:
+                features["cells"] = rows * columns
+        finally:
+            xlsx.close()
+    except Exception as e:
+        logging.info("Could not read the dimensions of {} - {}".format(inputFile, e))
+    return features
+
+
+def loadMemorySamples():
+    try:
+        with open(memoryFile) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def estimateMemory(features, samples):
+    baseMB = min([x["peakMB"] for x in samples], default=memoryBase)
+    calibrated = [x for x in samples if x["fileMB"] >= calibrationMB]
+    if features["cells"]:
+        rate = max(
+            [(x["peakMB"] - baseMB) / x["cells"] for x in calibrated if x["cells"]],
+            default=memoryPerCell,
+        )
+        return baseMB + max(rate, 0) * features["cells"]
+    rate = max(
+        [(x["peakMB"] - baseMB) / x["fileMB"] for x in calibrated],
+        default=memoryPerFileMB,
+    )
+    return baseMB + max(rate, 0) * features["fileMB"]
+
+
+# Adds the peak memory of the completed files to the calibration samples
+def calibrateMemory(summaries, fileFeatures):
+    samples = loadMemorySamples()
+    for summary in summaries:
+        features = fileFeatures.get(summary["inputFile"])
+        if summary["status"] != "complete" or not summary.get("peakMB"):
+            continue
+        if features is None:
+            continue
+        samples.append(dict(features, peakMB=summary["peakMB"]))
+    samples = samples[-memorySamples:]
+    tempFile = "{}.tmp".format(memoryFile)
+    with open(tempFile, "w") as f:
+        json.dump(samples, f, indent=1)
+    os.replace(tempFile, memoryFile)
+
+
+# ----- Parallel bulk processing ---------------------------------------------------------
+# Log records from a pool worker are held here and returned with each file's summary so
+# they can be written to the log by the main process, rather than several processes
+# writing to the same log file.
+workerLog = None
+
+
+# Module options set from the command line, these are passed to the pool workers as
+# spawned processes re-import the module with the defaults.
+def workerOptions():
+    return {
+        "chunkSize": chunkSize,
+        "debug": debug,
+        "ausNormal": ausNormal,
+        "phoneCountry": phoneCountry,
+        "useCache": useCache,
+        "cacheDir": cacheDir,
+        "cacheLimit": cacheLimit,
+        "contactStore": contactStore,
+        "profileRun": profileRun,
+        "exportThreads": exportThreads,
+        "exportBudget": exportBudget,
+        "outputFormat": outputFormat,
+        "maxMemory": maxMemory,
+        "journalRun": journalRun,
+        "indexRun": indexRun,
+        "appWorkers": appWorkers,
+        "partySheetNames": partySheetNames,
+        "externalParsers": externalParsers,
+    }
+
+
+def initWorker(options):
+    global workerLog, showProgress
+    globals().update(options)
+    # Progress bars from several workers would overwrite each other
+    showProgress = False
+    rootLogger = logging.getLogger()
+    for handler in list(rootLogger.handlers):
+        rootLogger.removeHandler(handler)
+    workerLog = logging.handlers.BufferingHandler(sys.maxsize)
+    rootLogger.addHandler(workerLog)
+    loadExternalParsers(externalParsers)
+
+
+# Runs in a pool worker, returns the file summary and the log records it produced
+def poolProcessFile(inputFile, inputProvenance):
+    summary = processFile(inputFile, inputProvenance)
+    return summary, takeWorkerLog()
+
+
+# Returns the log records held by a pool worker
+def takeWorkerLog():
+    records = []
+    for record in workerLog.buffer:
+        # Records are pickled back to the main process, so format the message first
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        records.append(record)
+    workerLog.buffer = []
+    return records
+
+
+# With fileTimeout set each file runs in its own process, so one that hangs can be killed
+# without stopping the rest of the run. It acts like the Future of a pool file.
+fileTimeout = None
+
+
+def runFileProcess(connection, options, inputFile, inputProvenance):
+    initWorker(options)
+    connection.send(poolProcessFile(inputFile, inputProvenance))
+    connection.close()
+
+
+class fileProcess:
+    def __init__(self, inputFile, inputProvenance) -> None:
+        self.startTime = time.time()
+        self.connection, childConnection = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=runFileProcess,
+            args=(childConnection, workerOptions(), inputFile, inputProvenance),
+            daemon=True,
+        )
+        self.process.start()
+        childConnection.close()
+
+    def timedOut(self):
+        return time.time() - self.startTime > fileTimeout
+
+    def done(self):
+        return self.connection.poll() or not self.process.is_alive() or self.timedOut()
+
+    def result(self):
+        try:
+            if not self.connection.poll() and self.timedOut():
+                raise TimeoutError("Timed out after {} seconds".format(fileTimeout))
+            return self.connection.recv()
+        except EOFError:
+            raise RuntimeError(
+                "Worker exited with code {}".format(self.process.exitcode)
+            ) from None
+        finally:
+            if self.process.is_alive():
+                self.process.kill()
+            self.process.join()
+            self.connection.close()
+
+
+def waitFileProcesses(futures):
+    while True:
+        finished = [x for x in futures if x.done()]
+        if finished:
+            return finished
+        multiprocessing.connection.wait(
+            [x.connection for x in futures] + [x.process.sentinel for x in futures],
+            timeout=1,
+        )
+
+
+# Files are started as workers come free. With maxMemory set the largest are started
+# first, and a file only starts if the estimated peaks of the running files leave room for
+# it. A file estimated over the whole of maxMemory runs on its own.
+def processPool(inputFiles, inputProvenance, workers, estimates=None):
+    print("Processing {} files with {} workers".format(len(inputFiles), workers))
+    logging.info("Processing {} files with {} workers".format(len(inputFiles), workers))
+    pendingFiles = list(inputFiles)
+    if maxMemory:
+        pendingFiles.sort(key=lambda x: estimates[x], reverse=True)
+        logging.info(
+            "Scheduling within {} MB, estimates {}".format(
+                maxMemory, {x: round(estimates[x]) for x in pendingFiles}
+            )
+        )
+    summaries = {}
+    futures = {}
+    memoryInUse = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initWorker, initargs=(workerOptions(),)
+    ) as pool:
+        while pendingFiles or futures:
+            for inputFile in list(pendingFiles):
+                if len(futures) >= workers:
+                    break
+                if maxMemory and futures:
+                    if memoryInUse + estimates[inputFile] > maxMemory:
+                        continue
+                pendingFiles.remove(inputFile)
+                if maxMemory:
+                    memoryInUse += estimates[inputFile]
+                journalEvent("start", inputFile=inputFile)
+                if fileTimeout:
+                    future = fileProcess(inputFile, inputProvenance)
+                else:
+                    future = pool.submit(poolProcessFile, inputFile, inputProvenance)
+                futures[future] = inputFile
+
+            if fileTimeout:
+                finished = waitFileProcesses(futures)
+            else:
+                finished = wait(futures, return_when=FIRST_COMPLETED).done
+            for future in finished:
+                inputFile = futures.pop(future)
+                if maxMemory:
+                    memoryInUse -= estimates[inputFile]
+                summaries[inputFile] = finishPoolFile(future, inputFile)
+                if summaries[inputFile]["status"] != "complete":
+                    removePartFiles(inputFile)
+                journalSummary(summaries[inputFile])
+    return [summaries[x] for x in inputFiles]
+
+
+# Returns the summary of a file from a pool worker and writes its log records
+def finishPoolFile(future, inputFile):
+    try:
+        summary, records = future.result()
+    except Exception as e:
+        # The worker process itself died, eg. killed when out of memory
+        logging.error("Worker processing {} failed - {}".format(inputFile, e))
+        summary = {"inputFile": inputFile, "status": "failed", "error": str(e)}
+        records = []
+    for record in records:
+        logging.getLogger().handle(record)
+    print("{} - {}".format(inputFile, summary["status"]))
+    return summary
+
+
+# Summaries of files whose worker died have no counts, the count columns are kept as
+# integers with those left blank rather than becoming floats
+summaryCountColumns = ["contacts", "outputs"]
+
+
+def summaryFrame(summaries):
+    summaryPD = pd.DataFrame(summaries)
+    for x in summaryPD.columns.intersection(summaryCountColumns):
+        summaryPD[x] = summaryPD[x].astype("Int64")
+    return summaryPD
+
+
+# Prints the results of a bulk run and saves them to clbExtract-summary.csv
+def writeSummary(summaries):
+    summaryPD = summaryFrame(summaries)
+    print("\nBulk processing summary")
+    for summary in summaries:
+        print(
+            "{} : {} {}".format(
+                summary["inputFile"], summary["status"], summary.get("error") or ""
+            )
+        )
+    logging.info(
+        "Bulk processing complete, {} of {} files complete".format(
+            len(summaryPD[summaryPD["status"] == "complete"]), len(summaryPD)
+        )
+    )
+    summaryPD.to_csv("clbExtract-summary.csv", index=False)
+
+
+# ------ Watch folder ---------------------------------------------------------------------------
+# Watches an intake folder and processes workbooks as they arrive, with a pool of workers
+# that keep running between files so pandas is only imported once per worker. Each
+# workbook's outputs, manifest and summary are written to a folder for its case, named
+# after the first folder below the intake folder it is in, or after the workbook if it
+# is in the intake folder itself.
+
+# Seconds a workbook's size must stay the same before it is processed, and seconds between
+# scans of the intake folder.
+watchSettle = 10
+watchPoll = 5
+
+# inotify events that wake the watcher, IN_CLOSE_WRITE, IN_MOVED_TO and IN_CREATE
+inotifyEvents = 0x8 | 0x80 | 0x100
+
+
+# Waits for changes in the intake folders with inotify on Linux, otherwise sleeps between
+# scans.
+class folderWatcher:
+    def __init__(self) -> None:
+        self.fd = None
+        self.watched = set()
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            fd = self.libc.inotify_init()
+        except (AttributeError, OSError, TypeError):
+            fd = -1
+        if fd >= 0:
+            self.fd = fd
+        else:
+            logging.info(
+                "inotify not available, polling every {} seconds".format(watchPoll)
+            )
+
+    def add(self, folder):
+        if self.fd is None or folder in self.watched:
+            return
+        if (
+            self.libc.inotify_add_watch(self.fd, os.fsencode(folder), inotifyEvents)
+            >= 0
+        ):
+            self.watched.add(folder)
+
+    # Returns when a watched folder changes or after timeout seconds
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(timeout)
+        elif select.select([self.fd], [], [], timeout)[0]:
+            os.read(self.fd, 65536)
+
+
+# Ctrl+C stops the watch in the main process, which lets running files finish
+def initWatchWorker(options):
+    initWorker(options)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# Runs in a pool worker, the outputs are written to the case folder
+def watchProcessFile(inputFile, inputProvenance, caseDir):
+    os.makedirs(caseDir, exist_ok=True)
+    os.chdir(caseDir)
+    return poolProcessFile(inputFile, inputProvenance)
+
+
+def caseFolder(inputFile, intakeDir, casesDir):
+    parts = inputFile.relative_to(intakeDir).parts
+    return str(casesDir / (parts[0] if len(parts) > 1 else inputFile.stem))
+
+
+def watchFolder(intakeDir, casesDir, inputProvenance, workers=None):
+    global cacheDir, contactStore
+    intakeDir = Path(intakeDir).resolve()
+    casesDir = Path(casesDir).resolve()
+    # Workers change to each case folder, so shared paths must not be relative
+    cacheDir = os.path.abspath(cacheDir)
+    if contactStore is not None:
+        contactStore = os.path.abspath(contactStore)
+
+    print("Watching {}, outputs are written to {}".format(intakeDir, casesDir))
+    logging.info("Watching {}, outputs written to {}".format(intakeDir, casesDir))
+    watcher = folderWatcher()
+    # rglob only yields the folders below the intake folder
+    watcher.add(intakeDir)
+    manifests = {}
+    caseSummaries = {}
+    # Size and modified time of each workbook, and when it was last seen to change
+    settling = {}
+    # Workbooks that failed, they are retried once they change
+    failed = {}
+    running = {}
+    with ProcessPoolExecutor(
+        max_workers=workers or 1,
+        initializer=initWatchWorker,
+        initargs=(workerOptions(),),
+    ) as pool:
+        try:
+            while True:
+                busyFiles = [x[0] for x in running.values()]
+                for path in intakeDir.rglob("*"):
+                    if casesDir == path or casesDir in path.parents:
+                        continue
+                    if path.is_dir():
+                        watcher.add(path)
+                        continue
+                    inputFile = str(path)
+                    if path.suffix.lower() != ".xlsx" or path.name.startswith("~$"):
+                        continue
+                    if inputFile in busyFiles:
+                        continue
+                    caseDir = caseFolder(path, intakeDir, casesDir)
+                    if caseDir not in manifests:
+                        manifests[caseDir] = loadManifest(caseDir)
+                        caseSummaries[caseDir] = {
+                            x: y["summary"] for x, y in manifests[caseDir].items()
+                        }
+                    fileStat = path.stat()
+                    fingerprint = (fileStat.st_size, fileStat.st_mtime_ns)
+                    if failed.get(inputFile) == fingerprint:
+                        continue
+                    if fileUnchanged(
+                        inputFile, manifests[caseDir].get(inputFile), caseDir
+                    ):
+                        continue
+
+                    # Wait until the workbook has finished copying
+                    lastChange = settling.get(inputFile)
+                    if lastChange is None or lastChange[0] != fingerprint:
+                        settling[inputFile] = (fingerprint, time.time())
+                        continue
+                    if time.time() - lastChange[1] < watchSettle:
+                        continue
+                    if not zipfile.is_zipfile(path):
+                        continue
+                    del settling[inputFile]
+
+                    print("Queueing {} for case {}".format(inputFile, caseDir))
+                    logging.info("Queueing {} for {}".format(inputFile, caseDir))
+                    future = pool.submit(
+                        watchProcessFile, inputFile, inputProvenance, caseDir
+                    )
+                    running[future] = (inputFile, caseDir, fingerprint)
+
+                for future in [x for x in running if x.done()]:
+                    inputFile, caseDir, fingerprint = running.pop(future)
+                    summary = finishPoolFile(future, inputFile)
+
+                    summary.pop("identifiers", None)
+                    summary.pop("profile", None)
+                    manifestEntry = summary.pop("manifest", None)
+                    manifest = manifests[caseDir]
+                    if summary["status"] == "complete":
+                        manifest[inputFile] = dict(manifestEntry, summary=summary)
+                        failed.pop(inputFile, None)
+                    else:
+                        manifest.pop(inputFile, None)
+                        failed[inputFile] = fingerprint
+                    os.makedirs(caseDir, exist_ok=True)
+                    saveManifest(manifest, caseDir)
+                    caseSummaries[caseDir][inputFile] = summary
+                    summaryFrame(list(caseSummaries[caseDir].values())).to_csv(
+                        os.path.join(caseDir, "clbExtract-summary.csv"), index=False
+                    )
+
+                watcher.wait(watchPoll)
+        except KeyboardInterrupt:
+            print("Stopping, waiting for {} running files".format(len(running)))
+            logging.info("Watch stopped")
+            pool.shutdown(cancel_futures=True)
+
+
 # FIXME - Deal with error when this info is missing
 ### -------- Process phone metadata ------------------------------------------------------
-def processMetadata(inputFile, inputProvenance):
+# Opens the workbook once, the Device Info and Contacts tabs are both read from it.
+# Returns the phoneData for the file. The fileFingerprint can be passed in if the caller
+# already has it, so the file is not hashed again for the sheet cache.
+def processMetadata(inputFile, inputProvenance, fingerprint=None):
+    phone = phoneData(
+        inFile=Path(inputFile).stem,
+        inPath=os.path.dirname(inputFile),
+        inProvenance=inputProvenance,
+    )
+    phone.inputPath = str(Path(inputFile).resolve())
+    phone.store = openStore(phone)
+    phone.writer = openWriter(phone)
+    completed = False
+    try:
+        with stageProfile(phone, "total") as stage:
+            with clbWorkbook(inputFile, openCache(), fingerprint) as workbook:
+                extractMetadata(workbook, inputFile, phone)
+            stage.rowsIn = sum(phone.appCounts.values())
+            if phone.writer is not None:
+                phone.writer.close()
+        completed = phone.error is None
+    finally:
+        if phone.writer is not None:
+            phone.writer.close()
+        closeOutputs(phone, completed)
+        if phone.store is not None:
+            phone.store.close()
+    if profileRun:
+        writeProfile(phone)
+    return phone
+
+
+# Device Info labels to look for and the phoneData attribute each is stored in
+deviceInfoFields = {
+    "IMEI": "IMEI",
+    "IMEI2": "IMEI2",
+    "Model": "model",
+    "Device Model": "model",
+    "OS Version": "osVersion",
+    "Operating System": "osVersion",
+}
+# Headers of the Device Info label column, Device in some exports
+deviceInfoLabels = ["Name", "Device"]
+
+
+# Finds the device details without reading the whole Device Info tab. The layout is picked
+# from the sheet names in the workbook index and rows are only read until every field in
+# deviceInfoFields is found. Returns None if there is no Device Info tab.
+def probeDeviceInfo(workbook):
+    for sheetName in [clbPhoneInfo, clbPhoneInfov2]:
+        if workbook.hasSheet(sheetName):
+            break
+    else:
+        return None
+
+    deviceInfo = {}
+    fieldCount = len(set(deviceInfoFields.values()))
+    # The header row below the title names the columns within B:D, the label is under
+    # Name or Device and the value under Value. Labels in the second layout have leading
+    # whitespace.
+    rows = workbook.xlsx.iterRows(sheetName, minRow=2)
+    try:
+        header = [None if x is None else str(x).strip() for x in next(rows, [])[1:4]]
+        labelCol = next((x for x in deviceInfoLabels if x in header), None)
+        if labelCol is None or "Value" not in header:
+            logging.warning("Device Info columns not found in {}".format(sheetName))
+            return deviceInfo
+        labelIndex = header.index(labelCol) + 1
+        valueIndex = header.index("Value") + 1
+        for row in rows:
+            if len(row) <= max(labelIndex, valueIndex) or row[labelIndex] is None:
+                continue
+            field = deviceInfoFields.get(str(row[labelIndex]).strip())
+            if field is not None and field not in deviceInfo:
+                deviceInfo[field] = row[valueIndex]
+                if len(deviceInfo) == fieldCount:
+                    break
+    finally:
+        rows.close()
+    return deviceInfo
+
+
+def extractMetadata(workbook, inputFile, phone):
     inputFile = inputFile
-    print("Input Provenance is {}".format(inputProvenance))
+    print("Input Provenance is {}".format(phone.inProvenance))
     print("Extracting metadata from {}".format(inputFile))
     logging.info("Extracting metadata from {}".format(inputFile))
 
-    phoneData.inProvenance = inputProvenance
-
     fileSize = os.path.getsize(inputFile) / 1048576
     if fileSize > warnSize:
         print(
-            "Large input file detected, {} MB and may take some time to process, sadly progress is not able to be updated while the file is loading".format(
+            "Large input file detected, {} MB and may take some time to process, progress will be shown while the contacts are loading".format(
                 f"{fileSize:.2f}"
             )
         )
     else:
         print("Input file is {} MB".format(f"{fileSize:.2f}"))
 
-    try:
-        infoPD = pd.read_excel(
-            inputFile, sheet_name=clbPhoneInfo, header=1, usecols="B,C,D"
-        )
-
-        try:
-            phoneData.IMEI = infoPD.loc[infoPD["Name"] == "IMEI", ["Value"]].values[0][
-                0
-            ]
-            phoneData.inFile = Path(inputFile).stem
-            phoneData.inPath = os.path.dirname(inputFile)
-            phoneData.inProvenance = inputProvenance
-        except:
-            print("Attempting Device Column")
-            try:
-                phoneData.IMEI = infoPD.loc[
-                    infoPD["Device"] == "IMEI", ["Value"]
-                ].values[0][0]
-                phoneData.inFile = Path(inputFile).stem
-                phoneData.inPath = os.path.dirname(inputFile)
-            except:
-                print("IMEI not located, setting to NULL")
-                phoneData.IMEI = None
-                phoneData.inFile = Path(inputFile).stem
-                phoneData.inPath = os.path.dirname(inputFile)
-
-        try:
-            phoneData.IMEI2 = infoPD.loc[infoPD["Name"] == "IMEI2", ["Value"]].values[
-                0
-            ][0]
-        except:
-            phoneData.IMEI2 = None
-            phoneData.inFile = Path(inputFile).stem
-            phoneData.inPath = os.path.dirname(inputFile)
-        # phoneData.inFile = inputFile.split(".")[0]
-        phoneData.inFile = Path(inputFile).stem
-        phoneData.inPath = os.path.dirname(inputFile)
-
-        if debug:
-            print(infoPD)
-            print(phoneData.IMEI)
+    with stageProfile(phone, "read device info"):
+        deviceInfo = probeDeviceInfo(workbook)
 
-    except ValueError:
+    if deviceInfo is None:
         print(
-            "Info tab not found in {}, attempting with second format.".format(inputFile)
+            "\033[1;31m Info tab not found in {}, apptempting with with no IMEI".format(
+                inputFile
+            )
         )
-        logging.exception(
-            "No info tab found in {}, attempting with second format".format(inputFile)
+        logging.warning(
+            "Info tab not found in {}, apptempting with with no IMEI".format(inputFile)
         )
-        try:
-            infoPD = pd.read_excel(
-                inputFile, sheet_name=clbPhoneInfov2, header=1, usecols="B,C,D"
-            )
-            # Remove leading whitespace from columns
-            infoPD["Name"] = infoPD["Name"].str.strip()
-            phoneData.IMEI = infoPD.loc[infoPD["Name"] == "IMEI", ["Value"]].values[0][
-                0
-            ]
-            print("Second format succeeded")
-            logging.info("Second format succeeded on {}".format(inputFile))
-
-            phoneData.inFile = Path(inputFile).stem
-            phoneData.inPath = os.path.dirname(inputFile)
-
-        except IndexError:
+        print("\033[1;31m Loaded {}, with no IMEI".format(inputFile))
+    else:
+        for field, value in deviceInfo.items():
+            setattr(phone, field, value)
+        if phone.IMEI is None:
             print("IMEI not located, is this a tablet or iPAD?")
             logging.warning(
                 "IMEI not found in {}, apptempting with with no IMEI".format(inputFile)
             )
-            phoneData.IMEI = None
-            phoneData.IMEI2 = None
-            phoneData.inFile = Path(inputFile).stem
-            phoneData.inPath = os.path.dirname(inputFile)
             print("Loaded {}, with no IMEI".format(inputFile))
-            logging.info("Loaded {}, with no IMEI".format(inputFile))
-            pass
 
-        except ValueError:
-            print(
-                "\033[1;31m Info tab not found in {}, apptempting with with no IMEI".format(
-                    inputFile
-                )
-            )
-            logging.warning(
-                "Info tab not found in {}, apptempting with with no IMEI".format(
-                    inputFile
-                )
-            )
-            phoneData.IMEI = None
-            phoneData.IMEI2 = None
-            # phoneData.inFile = inputFile.split(".")[0]
-            phoneData.inFile = Path(inputFile).stem
-            phoneData.inPath = os.path.dirname(inputFile)
-            print("\033[1;31m Loaded {}, with no IMEI".format(inputFile))
-            logging.info("Loaded {}, with no IMEI".format(inputFile))
-            pass
+    if debug:
+        print(deviceInfo)
+        print(phone.IMEI)
 
     try:
-        processContacts(inputFile)
+        processContacts(inputFile, workbook, phone)
+    except processCancelled:
+        raise
     except Exception as e:
         print(e)
+        phone.error = str(e)
     except ValueError:
         print("\033[1;31m No Contacts tab  found, is this a correctly formatted Excel?")
         logging.error(
@@ -293,296 +2318,998 @@ def processMetadata(inputFile, inputProvenance):
             )
         )
 
+    if partySheetNames:
+        try:
+            processParties(workbook, phone)
+        except processCancelled:
+            raise
+        except Exception as e:
+            print(e)
+            logging.error(
+                "Processing participants in {} failed: {}".format(inputFile, e)
+            )
+            phone.error = str(e)
+
+
+### Extract contacts tab of Excel file -------------------------------------------------------------------
+# This creates the initial dataframe, future processing is from copies of this dataframe.
+# An open clbWorkbook can be passed in to avoid opening the file a second time.
+def processContacts(inputFile, workbook=None, phone=None):
+    inputFile = inputFile
+    if phone is None:
+        phone = phoneData(
+            inFile=Path(inputFile).stem, inPath=os.path.dirname(inputFile)
+        )
+    fileSize = os.path.getsize(inputFile) / 1048576
+    print("Processing contacts in {} has begun.".format(phone.inFile))
+    logging.info("Processing contacts in {} has begun.".format(phone.inFile))
+
+    if fileSize > warnSize:
+        print(
+            "Large input file detected, {} MB and may take some time to process, progress will be shown while the contacts are loading".format(
+                f"{fileSize:.2f}"
+            )
+        )
+    else:
+        print("Input file is {} MB".format(f"{fileSize:.2f}"))
+
+    # Record input filename for use in export processes.
+    if debug:
+        print("\033[0;37m Input file is : {}".format(phone.inFile))
+
+    if workbook is None:
+        with clbWorkbook(inputFile, openCache()) as workbook:
+            readAndProcessContacts(workbook, phone)
+    else:
+        readAndProcessContacts(workbook, phone)
+
+    print("\nProcessing of {} complete".format(inputFile))
+
+
+# Loads the contacts tab whole, or chunk by chunk when chunkSize is set, and runs the
+# app parsers over it.
+def readAndProcessContacts(workbook, phone):
+    progress = contactProgress(workbook, phone)
+    if not chunkSize:
+        try:
+            with stageProfile(phone, "read contacts") as stage:
+                contactsPD = readContacts(workbook, progress)
+                stage.rowsIn = len(contactsPD)
+        finally:
+            if progress is not None:
+                progress.close()
+        processApps(contactsPD, phone)
+        return
+
+    print("Streaming contacts in chunks of {} rows".format(chunkSize))
+    logging.info("Streaming contacts in chunks of {} rows".format(chunkSize))
+    rowCount = 0
+    try:
+        contactChunks = iterContacts(workbook, progress)
+        while True:
+            checkCancelled()
+            with stageProfile(phone, "read contacts") as stage:
+                contactsPD = next(contactChunks, None)
+                if contactsPD is not None:
+                    stage.rowsIn = len(contactsPD)
+            if contactsPD is None:
+                break
+            print(
+                "\nProcessing contacts {} to {}".format(
+                    rowCount + 1, rowCount + len(contactsPD)
+                )
+            )
+            rowCount += len(contactsPD)
+            processApps(contactsPD, phone)
+    finally:
+        if progress is not None:
+            progress.close()
+
+
+# Progress is reported for files over warnSize, or all files if the GUI is listening
+def contactProgress(workbook, phone):
+    if not showProgress:
+        return None
+    fileSize = os.path.getsize(workbook.inputFile) / 1048576
+    if progressCallback is None and fileSize <= warnSize:
+        return None
+    return loadProgress(
+        "{} {}".format(phone.inFile, clbContactSheet), callback=progressCallback
+    )
+
+
+# Groups a contacts dataframe by Source once and hands each app's rows to its parser
+def processApps(contactsPD, phone):
+    print("\033[0mProcessing the following app types for : {}".format(phone.inFile))
+    applist = contactsPD["Source"].unique()
+    for x in applist:
+        if x in parsedApps:
+            print("{} : \u2713 ".format(x))
+
+        else:
+            print("{} : \u2716".format(x))
+
+    # Native contacts are stored with either null (iPhone) or "Phone" for Android
+    sourceKey = contactsPD["Source"]
+    if isinstance(sourceKey.dtype, pd.CategoricalDtype):
+        if "Phone" not in sourceKey.cat.categories:
+            sourceKey = sourceKey.cat.add_categories("Phone")
+    sourceKey = sourceKey.fillna("Phone")
+    appGroups = contactsPD.groupby(sourceKey, sort=False, observed=True)
+    for source, appPD in appGroups:
+        phone.appCounts[source] = phone.appCounts.get(source, 0) + len(appPD)
+    parsedGroups = [(x, y) for x, y in appGroups if x in appParsers]
+
+    if parallelApps() and len(parsedGroups) > 1:
+        processAppsParallel(parsedGroups, phone)
+        return
+
+    for appCount, (source, appPD) in enumerate(parsedGroups):
+        checkCancelled()
+        reportStep("app", source, appCount, len(parsedGroups))
+        runParser(source, appPD, phone)
+    reportStep("app", None, len(parsedGroups), len(parsedGroups))
+
+
+def runParser(source, appPD, phone):
+    try:
+        with stageProfile(phone, "parse {}".format(source), len(appPD)):
+            appParsers[source](appPD, phone)
+        journalEvent("app", inputFile=phone.inFile, app=source, rows=len(appPD))
+    except Exception as e:
+        print("Processing {} failed".format(source))
+        logging.warning("Failed to parse {} - {}".format(source, e))
+
+
+# App workers are started by the process parsing the file, unless it is itself a daemon
+# process (a --timeout file process) which cannot start processes of its own.
+def parallelApps():
+    if not appWorkers or appWorkers < 2 or chunkSize or pyarrow is None:
+        return False
+    return not multiprocessing.current_process().daemon
+
+
+# ------ Parallel app parsing -------------------------------------------------------------------
+# With appWorkers set the app parsers of a file run at the same time in a pool of worker
+# processes. Each app's rows are written once as an Arrow stream into shared memory, which
+# the worker reads in place without the frame being pickled. An app is only shared once a
+# worker is free for it. Workers write their outputs to the .part files and return the
+# columns, identifiers and profile for the main phoneData. The pool is kept for the next
+# file of a bulk run. Streamed chunks (chunkSize) are parsed one app at a time, as each
+# output is appended to.
+appWorkers = None
+appPool = None
+
+# phoneData attributes the app workers need
+appPhoneFields = [
+    "IMEI",
+    "IMEI2",
+    "model",
+    "osVersion",
+    "inFile",
+    "inPath",
+    "inputPath",
+    "inProvenance",
+]
+
+
+# Writes a frame to a new shared memory block as an Arrow stream, returns the block
+def shareFrame(appPD):
+    try:
+        table = pyarrow.Table.from_pandas(appPD)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # Columns mixing text and numbers, eg. numeric account names, are shared as text
+        appPD = appPD.apply(
+            lambda x: (
+                x.map(lambda y: y if pd.isna(y) else str(y)) if x.dtype == object else x
+            )
+        )
+        table = pyarrow.Table.from_pandas(appPD)
+    streamSize = pyarrow.MockOutputStream()
+    with pyarrow.ipc.new_stream(streamSize, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(streamSize.size(), 1))
+    with pyarrow.ipc.new_stream(
+        pyarrow.FixedSizeBufferWriter(pyarrow.py_buffer(block.buf)), table.schema
+    ) as writer:
+        writer.write_table(table)
+    return block
+
+
+# The frame is read in place, its columns can be views of the block
+def readSharedFrame(block):
+    with pyarrow.ipc.open_stream(pyarrow.py_buffer(block.buf)) as reader:
+        return reader.read_all().to_pandas()
+
+
+# The block can only be closed once nothing refers to its buffer. If a frame is still held,
+# eg. by the traceback of a failed parser, the block is left to be closed when it is freed.
+def closeSharedBlock(block):
+    gc.collect()
+    try:
+        block.close()
+    except BufferError:
+        logging.info("Shared block {} still in use, not closed".format(block.name))
+
+
+# Runs in an app worker
+def parseSharedApp(source, blockName, phoneFields):
+    phone = phoneData()
+    for x, y in phoneFields.items():
+        setattr(phone, x, y)
+    phone.store = openStore(phone, clear=False)
+    phone.writer = openWriter(phone)
+    block = shared_memory.SharedMemory(name=blockName)
+    try:
+        runParser(source, readSharedFrame(block), phone)
+    finally:
+        if phone.writer is not None:
+            phone.writer.close()
+        closeTables(phone)
+        if phone.store is not None:
+            phone.store.close()
+        closeSharedBlock(block)
+    return (
+        {
+            "outputs": phone.outputs,
+            "identifiers": phone.identifiers,
+            "profile": phone.profile,
+        },
+        takeWorkerLog(),
+    )
+
+
+def openAppPool():
+    global appPool
+    if appPool is None:
+        appPool = ProcessPoolExecutor(
+            max_workers=appWorkers,
+            initializer=initWorker,
+            initargs=(workerOptions(),),
+        )
+        # Shut down before multiprocessing joins the child processes at exit, and ahead of
+        # the queue feeders (priority 10), otherwise a bulk pool worker waits on its idle
+        # app workers forever
+        multiprocessing.util.Finalize(None, closeAppPool, exitpriority=20)
+    return appPool
+
+
+def closeAppPool():
+    global appPool
+    if appPool is not None:
+        appPool.shutdown(wait=True)
+        appPool = None
+
+
+def processAppsParallel(appGroups, phone):
+    phoneFields = {x: getattr(phone, x) for x in appPhoneFields}
+    pendingApps = list(appGroups)
+    blocks = {}
+    futures = {}
+    appCount = 0
+    try:
+        while pendingApps or futures:
+            while pendingApps and len(futures) < appWorkers:
+                checkCancelled()
+                source, appPD = pendingApps.pop(0)
+                blocks[source] = shareFrame(appPD)
+                future = openAppPool().submit(
+                    parseSharedApp, source, blocks[source].name, phoneFields
+                )
+                futures[future] = source
+
+            for future in wait(futures, return_when=FIRST_COMPLETED).done:
+                source = futures.pop(future)
+                releaseSharedBlock(blocks.pop(source))
+                appCount += 1
+                reportStep("app", source, appCount, len(appGroups))
+                try:
+                    result, records = future.result()
+                except Exception as e:
+                    # The worker process itself died, eg. killed when out of memory
+                    print("Processing {} failed".format(source))
+                    logging.warning("Failed to parse {} - {}".format(source, e))
+                    if isinstance(e, BrokenProcessPool):
+                        closeAppPool()
+                    continue
+                for record in records:
+                    logging.getLogger().handle(record)
+                phone.outputs.update(result["outputs"])
+                phone.profile.extend(result["profile"])
+                for identifier, apps in result["identifiers"].items():
+                    phone.identifiers.setdefault(identifier, set()).update(apps)
+    finally:
+        # Apps already handed to a worker are left to finish before their blocks go
+        wait(futures)
+        for block in blocks.values():
+            releaseSharedBlock(block)
+
+
+def releaseSharedBlock(block):
+    block.close()
+    block.unlink()
+
+
+# Load the contacts tab from an open workbook. With a loadProgress the tab is streamed
+# so progress can be reported while it loads.
+def readContacts(workbook, progress=None):
+    if progress is not None:
+        contactChunks = list(iterContacts(workbook, progress, 10000))
+        if contactChunks:
+            return compactContacts(pd.concat(contactChunks))
+    return compactContacts(
+        workbook.readSheet(
+            clbContactSheet,
+            header=1,
+            index_col="#",
+            usecols=["#", "Name", "Entries", "Source", "Account"],
+        )
+    )
+
+
+# Stream the contacts tab from an open workbook in chunks of chunkSize rows, a cancel is
+# checked for before each chunk
+def iterContacts(workbook, progress=None, chunkRows=None):
+    contactChunks = workbook.iterSheet(
+        clbContactSheet,
+        chunkRows or chunkSize,
+        header=1,
+        index_col="#",
+        usecols=["#", "Name", "Entries", "Source", "Account"],
+        progress=progress,
+    )
+    for contactPD in contactChunks:
+        checkCancelled()
+        yield compactContacts(contactPD)
+
+
+# ------ Call log and chat participants ---------------------------------------------------------
+# The other parties to calls and chats are read from the same open workbook as the contacts,
+# each tab in partySheetNames is streamed once. Party cells hold one party a line, the
+# identifier then the name, eg. "+61 412 345 678 John Smith" or "To: 61412345678@s.whatsapp.net
+# John", and the device owner is marked "(owner)". Only a phone number or a token with an @,
+# digit, underscore or inner dot is taken as the identifier, parties known only by a name
+# such as "Mum" or "Unknown" have no identifier and are left out of the store and index.
+# Each party becomes a row of the PARTIES output tagged with the tab it came from, with its
+# phone number normalised like the contacts.
+partySheets = {
+    clbCallSheet: ["Parties", "From", "To"],
+    clbChatSheet: ["Participants"],
+}
+partyPattern = r"^(?:(?P<Direction>From|To):\s*)?(?:(?P<Identifier>\+?\d[\d ().-]*\d|\S*[@\d_]\S*|\S+\.\S+)(?=\s|$))?\s*(?P<Name>.*?)\s*(?P<Owner>\(owner\))?$"
+partyColumns = [
+    "Sheet",
+    "Row",
+    "Source",
+    "Account",
+    "Role",
+    "Name",
+    "Identifier",
+    "E164",
+    "Owner",
+    originIMEI,
+    "inputFile",
+    "Provenance",
+]
+
+
+def processParties(workbook, phone):
+    for sheetName in partySheetNames:
+        if not workbook.hasSheet(sheetName):
+            print("No {} tab found in {}".format(sheetName, phone.inFile))
+            logging.warning("No {} tab found in {}".format(sheetName, phone.inFile))
+            continue
+
+        print("\nProcessing {} participants".format(sheetName))
+        partyCount = 0
+        sheetChunks = workbook.iterSheet(sheetName, chunkSize or 10000, header=1)
+        while True:
+            checkCancelled()
+            with stageProfile(phone, "read {}".format(sheetName)) as stage:
+                sheetPD = next(sheetChunks, None)
+                if sheetPD is not None:
+                    stage.rowsIn = len(sheetPD)
+            if sheetPD is None:
+                break
+            with stageProfile(phone, "parse {}".format(sheetName), len(sheetPD)):
+                partyPD = partyFrame(sheetPD, sheetName, phone)
+                partyCount += len(partyPD)
+                if len(partyPD):
+                    exportCSV(partyPD, "{}-PARTIES.csv".format(phone.inFile), phone)
+
+        print("{} {} participants located".format(partyCount, sheetName))
+        logging.info(
+            "{} {} participants located in {}".format(
+                partyCount, sheetName, phone.inFile
+            )
+        )
+
+
+# Splits the party columns of a chunk of a call or chat tab into one row per party
+def partyFrame(sheetPD, sheetName, phone):
+    partyCols = [x for x in partySheets[sheetName] if x in sheetPD.columns]
+    sheetPD = sheetPD.rename(columns={"#": "Row"}).reset_index(drop=True)
+    sheetPD = sheetPD.reindex(columns=["Row", "Source", "Account"] + partyCols)
+
+    # Parties stay in the order of the rows they were listed on
+    partyPD = sheetPD.melt(
+        id_vars=["Row", "Source", "Account"],
+        value_vars=partyCols,
+        var_name="Role",
+        value_name="Party",
+        ignore_index=False,
+    ).sort_index(kind="stable")
+    partyPD = partyPD[partyPD["Party"].notna()]
+    partyPD["Party"] = partyPD["Party"].astype(str).str.split("\n")
+    partyPD = partyPD.explode("Party").reset_index(drop=True)
+    partyPD = partyPD.join(partyPD.pop("Party").str.strip().str.extract(partyPattern))
+    partyPD = partyPD[
+        partyPD["Identifier"].notna() | (partyPD["Name"] != "")
+    ].reset_index(drop=True)
+
+    # A From: or To: label is the direction of the party within a Parties cell
+    partyPD["Role"] = partyPD.pop("Direction").fillna(partyPD["Role"])
+    partyPD["Owner"] = partyPD["Owner"].notna()
+    # Apps list phone numbers as user IDs, eg. 61412345678@s.whatsapp.net
+    phonesPD = normalisePhones(partyPD["Identifier"].str.split("@").str[0])
+    partyPD["E164"] = phonesPD["E164"]
+
+    partyPD["Sheet"] = constantColumn(sheetName, len(partyPD))
+    partyPD[originIMEI] = constantColumn(phone.IMEI, len(partyPD))
+    partyPD["inputFile"] = constantColumn(phone.inFile, len(partyPD))
+    partyPD["Provenance"] = constantColumn(phone.inProvenance, len(partyPD))
+    return compactContacts(partyPD[partyColumns])
+
+
+# ------ Compact frames -------------------------------------------------------------------------
+# Source and Account repeat a handful of values over every row of the contacts tab, so they
+# are held as categoricals: one small code per row instead of a string object each.
+compactColumns = ["Source", "Account"]
+
+
+def compactContacts(contactsPD):
+    for x in contactsPD.columns.intersection(compactColumns):
+        contactsPD[x] = contactsPD[x].astype("category")
+    return contactsPD
+
+
+# A column holding the same value on every row, such as the IMEI, input file and provenance
+# added to each output. It costs one byte a row and is only expanded to text when written.
+def constantColumn(value, length):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return pd.Categorical.from_codes(
+            np.full(length, -1, dtype="int8"), categories=[]
+        )
+    return pd.Categorical.from_codes(np.zeros(length, dtype="int8"), categories=[value])
+
+
+# ------ Background export ----------------------------------------------------------------------
+# Parsers hand their finished frames to an exportWriter and carry on parsing while writer
+# threads save them. Each output is always written by the same thread so chunks are
+# appended in order. Parsers wait if the frames waiting to be written would go over
+# exportBudget MB.
+class exportWriter:
+    def __init__(self, phone, threads, budgetMB) -> None:
+        self.phone = phone
+        self.lanes = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="clbExport")
+            for x in range(threads)
+        ]
+        self.outputLanes = {}
+        self.budget = budgetMB * 1048576
+        self.pending = 0
+        self.condition = threading.Condition()
+        self.futures = []
+
+    def submit(self, outputPD, outputName):
+        frameSize = int(outputPD.memory_usage(deep=True).sum())
+        with self.condition:
+            # A frame larger than the whole budget is written on its own
+            while self.pending and self.pending + frameSize > self.budget:
+                self.condition.wait()
+            self.pending += frameSize
+
+        if outputName not in self.outputLanes:
+            self.outputLanes[outputName] = len(self.outputLanes) % len(self.lanes)
+        lane = self.lanes[self.outputLanes[outputName]]
+        self.futures.append(
+            (outputName, lane.submit(self._write, outputPD, outputName, frameSize))
+        )
+
+    def _write(self, outputPD, outputName, frameSize):
+        try:
+            startTime = time.perf_counter()
+            startCPU = time.thread_time()
+            writeOutput(outputPD, outputName, self.phone)
+            if profileRun:
+                self.phone.profile.append(
+                    {
+                        "inputFile": self.phone.inFile,
+                        "stage": "export {}".format(outputName),
+                        "seconds": round(time.perf_counter() - startTime, 3),
+                        "cpuSeconds": round(time.thread_time() - startCPU, 3),
+                        "rowsIn": len(outputPD),
+                        "rowsOut": len(outputPD),
+                        "peakMB": None,
+                    }
+                )
+        finally:
+            with self.condition:
+                self.pending -= frameSize
+                self.condition.notify_all()
+
+    # Waits for every write to finish. A failed write fails the input file, so its
+    # outputs are not committed.
+    def close(self):
+        for lane in self.lanes:
+            lane.shutdown(wait=True)
+        futures, self.futures = self.futures, []
+        for outputName, future in futures:
+            if future.exception() is not None:
+                print("Exporting {} failed - {}".format(outputName, future.exception()))
+                logging.error(
+                    "Exporting {} failed - {}".format(outputName, future.exception())
+                )
+                if self.phone.error is None:
+                    self.phone.error = "Exporting {} failed - {}".format(
+                        outputName, future.exception()
+                    )
+
+
+# Returns the export writer for an input file, or None to write in the parser's thread
+def openWriter(phone):
+    if not exportThreads:
+        return None
+    return exportWriter(phone, exportThreads, exportBudget)
+
+
+# ------ Export CSV -----------------------------------------------------------------------------
+# The first write to an output creates it, later writes for the same input file (streamed
+# chunks) are appended under the existing header.
+def exportCSV(outputPD, outputName, phone, columns=None):
+    if columns is not None:
+        outputPD = outputPD[columns]
+
+    # Only normalised when there is a store to write or an index to update
+    if phone.store is not None or indexRun:
+        storePD = storeFrame(outputPD, outputName, phone)
+        if phone.store is not None:
+            phone.store.write(storePD)
+        if indexRun:
+            indexContacts(storePD, phone)
+
+    addRowsOut(phone, len(outputPD))
+    if phone.writer is not None:
+        phone.writer.submit(outputPD, outputName)
+        return
+    with stageProfile(phone, "export {}".format(outputName), len(outputPD)) as stage:
+        stage.rowsOut = len(outputPD)
+        writeOutput(outputPD, outputName, phone)
+
+
+def writeOutput(outputPD, outputName, phone):
+    fileName = outputFile(outputName)
+    if fileName not in phone.outputs:
+        journalEvent("output", inputFile=phone.inFile, output=fileName)
+    if outputFormat in tableFormats:
+        table = phone.tables.get(fileName)
+        if table is None:
+            table = phone.tables[fileName] = tableOutput(fileName, outputPD)
+        table.write(outputPD)
+        phone.outputs[fileName] = table.schema.names
+    else:
+        writeCSV(outputPD, fileName, phone)
+
+
+# Output file for an app's output in outputFormat, eg. dev1-NATIVE.csv as dev1-NATIVE.parquet
+def outputFile(outputName):
+    if outputFormat == "csv":
+        return outputName
+    return "{}.{}".format(outputName[: -len(".csv")], outputFormat)
+
+
+# Compression of a CSV output, pandas streams it while writing
+def csvCompression(fileName):
+    if fileName.endswith(".gz"):
+        return "gzip"
+    if fileName.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def writeCSV(outputPD, outputName, phone):
+    writtenCols = phone.outputs.get(outputName)
+    if writtenCols is None:
+        outputPD.to_csv(
+            partFile(outputName), index=False, compression=csvCompression(outputName)
+        )
+        phone.outputs[outputName] = list(outputPD.columns)
+        return
+
+    # A later chunk can contain columns the first did not, eg. more Signal entries.
+    newCols = [x for x in outputPD.columns if x not in writtenCols]
+    if newCols:
+        writtenCols = writtenCols + newCols
+        widenCSV(partFile(outputName), phone.outputs[outputName], writtenCols)
+        phone.outputs[outputName] = writtenCols
+
+    outputPD.reindex(columns=writtenCols).to_csv(
+        partFile(outputName),
+        mode="a",
+        header=False,
+        index=False,
+        compression=csvCompression(outputName),
+    )
+
+
+# Rewrites an existing output with extra columns, a chunk at a time.
+def widenCSV(outputName, oldCols, newCols):
+    logging.info("Adding columns {} to {}".format(newCols[len(oldCols) :], outputName))
+    tempName = "{}.tmp".format(outputName)
+    writeHeader = True
+    for partPD in pd.read_csv(
+        outputName,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunkSize or 100000,
+        compression=csvCompression(outputName),
+    ):
+        partPD.columns = oldCols
+        partPD.reindex(columns=newCols).to_csv(
+            tempName,
+            mode="w" if writeHeader else "a",
+            header=writeHeader,
+            index=False,
+            compression=csvCompression(outputName),
+        )
+        writeHeader = False
+    if writeHeader:
+        pd.DataFrame(columns=newCols).to_csv(
+            tempName, index=False, compression=csvCompression(outputName)
+        )
+    os.replace(tempName, outputName)
+
+
+# ------ Parquet and Arrow outputs --------------------------------------------------------------
+# Columns written as dictionary encoded categoricals, they hold one value per input file
+categoryColumns = ["Source", "Provenance", "inputFile", originIMEI]
+
+
+# Converts an output to the types written to Parquet and Arrow. Text columns are written as
+# strings so numeric IDs keep their leading zeros and digits, numeric columns keep their type.
+def tableFrame(outputPD):
+    outputPD = outputPD.rename(columns=str).reset_index(drop=True)
+    for x in outputPD.columns:
+        if x in categoryColumns:
+            outputPD[x] = outputPD[x].astype("string").astype("category")
+        elif outputPD[x].dtype == object:
+            outputPD[x] = outputPD[x].astype("string")
+    return outputPD
+
+
+# Schema of an output, fixed by its first write. Empty columns are typed as strings so
+# later chunks can fill them.
+def tableSchema(outputPD):
+    fields = []
+    for field in pyarrow.Schema.from_pandas(outputPD, preserve_index=False):
+        if pyarrow.types.is_dictionary(field.type):
+            field = field.with_type(
+                pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+            )
+        elif pyarrow.types.is_null(field.type):
+            field = field.with_type(pyarrow.string())
+        fields.append(field)
+    return pyarrow.schema(fields)
+
+
+def openTableWriter(fileName, schema):
+    if outputFormat == "parquet":
+        return pyarrow.parquet.ParquetWriter(fileName, schema, compression="zstd")
+    return pyarrow.ipc.new_file(
+        fileName,
+        schema,
+        options=pyarrow.ipc.IpcWriteOptions(
+            compression="zstd", emit_dictionary_deltas=True
+        ),
+    )
 
-### Extract contacts tab of Excel file -------------------------------------------------------------------
-# This creates the initial dataframe, future processing is from copies of this dataframe.
-def processContacts(inputFile):
-    inputFile = inputFile
-    fileSize = os.path.getsize(inputFile) / 1048576
-    print("Processing contacts in {} has begun.".format(phoneData.inFile))
-    logging.info("Processing contacts in {} has begun.".format(phoneData.inFile))
 
-    if fileSize > warnSize:
-        print(
-            "Large input file detected, {} MB and may take some time to process, sadly progress is not able to be updated while the file is loading".format(
-                f"{fileSize:.2f}"
+def readTableBatches(fileName):
+    if outputFormat == "parquet":
+        yield from pyarrow.parquet.ParquetFile(fileName).iter_batches()
+        return
+    with pyarrow.ipc.open_file(fileName) as reader:
+        for x in range(reader.num_record_batches):
+            yield reader.get_batch(x)
+
+
+# A Parquet or Arrow output kept open while an input file is processed, so streamed chunks
+# are written as row groups or record batches. It is written to a .part file like the CSV
+# outputs.
+class tableOutput:
+    def __init__(self, fileName, outputPD) -> None:
+        self.fileName = fileName
+        self.widenCount = 0
+        self.tempName = partFile(fileName)
+        self.categories = {}
+        self.schema = tableSchema(tableFrame(outputPD))
+        self.writer = openTableWriter(self.tempName, self.schema)
+
+    def write(self, outputPD):
+        outputPD = tableFrame(outputPD)
+        # Arrow files can only extend a dictionary, so categories are kept in the order
+        # first seen and each chunk's are added to the end.
+        for x in outputPD.columns.intersection(categoryColumns):
+            seen = self.categories.setdefault(x, [])
+            seen.extend(y for y in outputPD[x].cat.categories if y not in seen)
+            outputPD[x] = outputPD[x].cat.set_categories(seen)
+        newCols = [x for x in outputPD.columns if x not in self.schema.names]
+        if newCols:
+            self.widen(tableSchema(outputPD[newCols]))
+        self.writer.write_table(
+            pyarrow.Table.from_pandas(
+                outputPD.reindex(columns=self.schema.names),
+                schema=self.schema,
+                preserve_index=False,
             )
         )
-    else:
-        print("Input file is {} MB".format(f"{fileSize:.2f}"))
-
-    # Record input filename for use in export processes.
-    if debug:
-        print("\033[0;37m Input file is : {}".format(phoneData.inFile))
 
-    contactsPD = pd.read_excel(
-        inputFile,
-        sheet_name=clbContactSheet,
-        header=1,
-        index_col="#",
-        usecols=["#", "Name", "Entries", "Source", "Account"],
+    # A later chunk can contain columns the first did not, the rows written so far are
+    # copied to a new file with the extra columns left empty.
+    def widen(self, newSchema):
+        logging.info("Adding columns {} to {}".format(newSchema.names, self.fileName))
+        self.writer.close()
+        oldName = self.tempName
+        self.widenCount += 1
+        self.tempName = partFile("{}.{}".format(self.fileName, self.widenCount))
+        self.schema = pyarrow.unify_schemas([self.schema, newSchema])
+        self.writer = openTableWriter(self.tempName, self.schema)
+        for batch in readTableBatches(oldName):
+            table = pyarrow.Table.from_batches([batch])
+            for field in newSchema:
+                table = table.append_column(
+                    field, pyarrow.nulls(len(table), type=field.type)
+                )
+            self.writer.write_table(table.select(self.schema.names))
+        os.remove(oldName)
+
+    def close(self):
+        self.writer.close()
+        if self.tempName != partFile(self.fileName):
+            os.replace(self.tempName, partFile(self.fileName))
+
+
+# Closes the open Parquet and Arrow outputs of an input file. If the file completed its
+# outputs are renamed into place, otherwise they are removed.
+def closeOutputs(phone, commit=True):
+    closeTables(phone)
+    missingFiles = [x for x in phone.outputs if not os.path.exists(partFile(x))]
+    if commit and missingFiles:
+        # Another process removed them, the file is not complete
+        phone.error = "Outputs missing before completion: {}".format(
+            ", ".join(missingFiles)
+        )
+        logging.error("{} - {}".format(phone.inFile, phone.error))
+        commit = False
+    for fileName in phone.outputs:
+        if fileName in missingFiles:
+            continue
+        if commit:
+            os.replace(partFile(fileName), fileName)
+        else:
+            removePath(partFile(fileName))
+
+
+def closeTables(phone):
+    tables, phone.tables = phone.tables, {}
+    for table in tables.values():
+        table.close()
+
+
+# ------ Field extraction -----------------------------------------------------------------------
+# Entries are held in long format, one row per entry line with the contact it came from, its
+# label and its value. Contacts with hundreds of entries then add rows rather than hundreds
+# of mostly empty columns for every contact of the app.
+def explodeEntries(appPD):
+    entriesPD = (
+        appPD["Entries"]
+        .fillna("")
+        .astype(str)
+        .set_axis(range(len(appPD)))
+        .str.split("\n")
+        .explode()
+    )
+    entryParts = entriesPD.str.split(":", n=1, expand=True)
+    return pd.DataFrame(
+        {
+            "contact": entriesPD.index,
+            "key": entryParts[0].astype("category").values,
+            "value": entryParts[1].values if entryParts.shape[1] > 1 else None,
+        }
     )
 
-    print("\033[0mProcessing the following app types for : {}".format(phoneData.inFile))
-    applist = contactsPD["Source"].unique()
-    for x in applist:
-        if x in parsedApps:
-            print("{} : \u2713 ".format(x))
 
+# Each distinct label is matched against the app's field table a single time, then only the
+# matched values are pivoted out into their output columns. Later entries overwrite
+# earlier ones.
+def extractFields(appPD, fields):
+    entriesPD = explodeEntries(appPD)
+    appPD = appPD.drop("Entries", axis=1)
+
+    targetLabels = {}
+    for label in entriesPD["key"].cat.categories:
+        for target in matchFields(label, fields):
+            targetLabels.setdefault(target, []).append(label)
+
+    for target in fields.values():
+        targetValues = pd.Series(None, index=range(len(appPD)), dtype=object)
+        if target in targetLabels:
+            matchedPD = entriesPD[entriesPD["key"].isin(targetLabels[target])]
+            matchedPD = matchedPD.drop_duplicates("contact", keep="last")
+            targetValues[matchedPD["contact"].values] = matchedPD["value"].values
+        appPD[target] = targetValues.values
+    return appPD
+
+
+# Output columns for an entry label. Prefixes ending in ":" must match the whole label,
+# others match any label starting with them, eg. "Phone-" matches "Phone-Mobile".
+def matchFields(label, fields):
+    targets = []
+    for prefix, target in fields.items():
+        if prefix.endswith(":"):
+            matched = label + ":" == prefix
         else:
-            print("{} : \u2716".format(x))
+            matched = label.startswith(prefix)
+        if matched and target not in targets:
+            targets.append(target)
+    return targets
+
+
+# ------ Phone number normalisation --------------------------------------------------------------
+# One engine is shared by every parser. Formatting is removed in a single regex pass, then
+# each number is resolved to E.164 using the rules for phoneCountry: the country calling
+# code, the trunk prefix dialled before national numbers, the international prefix dialled
+# before other countries' numbers and the lengths of national numbers without the trunk.
+# "00" is taken as an international prefix in every country, as numbers saved abroad use
+# it. Rules for other countries can be added to countryRules.
+countryRules = {
+    "AU": {"dial": "61", "trunk": "0", "idd": "0011", "lengths": [9]},
+    "NZ": {"dial": "64", "trunk": "0", "idd": "00", "lengths": [8, 9, 10]},
+    "UK": {"dial": "44", "trunk": "0", "idd": "00", "lengths": [9, 10]},
+    "IE": {"dial": "353", "trunk": "0", "idd": "00", "lengths": [7, 8, 9]},
+    "US": {"dial": "1", "trunk": "", "idd": "011", "lengths": [10]},
+    "CA": {"dial": "1", "trunk": "", "idd": "011", "lengths": [10]},
+    "SG": {"dial": "65", "trunk": "", "idd": "001", "lengths": [8]},
+    "VN": {"dial": "84", "trunk": "0", "idd": "00", "lengths": [9, 10]},
+}
+
+# Spacing and punctuation, and "Message" which some Inseyets reports add to numbers
+phoneFormatting = re.compile(r"Message|[\s\-().]")
+
+
+# Returns a dataframe with the number without formatting, its E.164 form (None if it could
+# not be resolved) and its national form. Numbers from other countries keep their E.164
+# form as the national form, unresolved numbers keep the number without formatting.
+def normalisePhones(numbers, country=None):
+    rules = countryRules[country or phoneCountry]
+    dial, trunk = rules["dial"], rules["trunk"]
+    # Exploded entries repeat their contact's index, work on positions instead
+    numbersIndex = numbers.index
+    numbers = numbers.reset_index(drop=True)
+    cleaned = numbers.astype(object).where(numbers.notna(), "").astype(str)
+    cleaned = cleaned.str.strip().str.replace(phoneFormatting, "", regex=True)
+
+    # The country's own prefix is tried before 00, eg. 0011 in Australia
+    internationalPrefix = r"^(?:\+|{}|00)".format(re.escape(rules["idd"]))
+    international = cleaned.str.contains(internationalPrefix)
+    digits = cleaned.str.replace(internationalPrefix, "", regex=True)
+    validDigits = digits.str.fullmatch(r"\d{6,15}")
+    digitCount = digits.str.len()
+    withDial = (
+        ~international
+        & digits.str.startswith(dial)
+        & (digitCount - len(dial)).isin(rules["lengths"])
+    )
+    withTrunk = (
+        ~international
+        & digits.str.startswith(trunk)
+        & (digitCount - len(trunk)).isin(rules["lengths"])
+    )
 
-    # Process native contacts
-    try:
-        processAppleNative(contactsPD)
-    except Exception as e:
-        print("Processing native contacts failed")
-        print(e)
-        pass
+    e164 = pd.Series(None, index=numbers.index, dtype=object)
+    e164 = e164.mask(validDigits & (international | withDial), "+" + digits)
+    e164 = e164.mask(
+        validDigits & withTrunk & ~withDial, "+" + dial + digits.str[len(trunk) :]
+    )
 
-    # Process Apps
-    for x in applist:
-        if x == "Facebook Messenger":
-            try:
-                processFacebookMessenger(contactsPD)
-            except Exception as e:
-                logging.warning("Failed to parse Facebook messenger - {}".format(e))
-                pass
-        if x == "Instagram":
-            try:
-                processInstagram(contactsPD)
-            except:
-                logging.warning("Failed to parse Instagram")
-                pass
-        if x == "Line":
-            try:
-                processLine(contactsPD)
-            except:
-                logging.warning("Failed to parse Line")
-                pass
-        if x == "Outlook":
-            try:
-                processOutlookContacts(contactsPD)
-            except:
-                logging.warning("Failed to parse Outlook")
-                pass
-        if x == "Recents":
-            try:
-                processRecents(contactsPD)
-            except:
-                logging.warning("Failed to parse Recents")
-                pass
-        if x == "Snapchat":
-            try:
-                processSnapChat(contactsPD)
-            except:
-                logging.warning("Failed to parse Snapchat")
-                pass
-        if x == "Telegram":
-            try:
-                processTelegram(contactsPD)
-            except:
-                logging.warning("Failed to parse Telegram")
-                pass
-        if x == "Threema":
-            try:
-                processThreema(contactsPD)
-            except:
-                logging.warning("Failed to parse Threema")
-                pass
-        if x == "Signal":
-            try:
-                processSignal(contactsPD)
-            except:
-                logging.warning("Failed to parse Signal")
-                pass
-        if x == "Signal Private Messenger":
-            try:
-                processSignalPrivateMessenger(contactsPD)
-            except:
-                logging.warning("Failed to parse Signal Private Messenger")
-
-        if x == "WeChat":
-            try:
-                processWeChat(contactsPD)
-            except:
-                logging.warning("Failed to parse WeChat")
-                pass
-        if x == "WhatsApp":
-            try:
-                processWhatsapp(contactsPD)
-            except Exception as e:
-                logging.warning("Failed to parse WhatsApp - {}".format(e))
-                pass
-        if x == "Zalo":
-            try:
-                processZalo(contactsPD)
-            except:
-                logging.warning("Failed to parse Zalo")
-                pass
+    national = cleaned.where(e164.isna(), e164)
+    homeNumbers = e164.str.startswith("+" + dial, na=False)
+    national = national.mask(homeNumbers, trunk + e164.str[len(dial) + 1 :])
 
-    print("\nProcessing of {} complete".format(inputFile))
+    phonesPD = pd.DataFrame({"Cleaned": cleaned, "E164": e164, "National": national})
+    phonesPD = phonesPD.astype(object).where(numbers.notna(), None)
+    phonesPD.index = numbersIndex
+    return phonesPD
+
+
+# Column written in place of a parser's phone numbers, national form if ausNormal is set
+def phoneColumn(phonesPD):
+    return phonesPD["National"] if ausNormal else phonesPD["Cleaned"]
 
 
 # ------ Parse Facebook Messenger --------------------------------------------------------------
-def processFacebookMessenger(contactsPD):
+def processFacebookMessenger(appPD, phone):
     print("\nProcessing Facebook Messenger")
-    facebookMessengerPD = contactsPD[contactsPD["Source"] == "Facebook Messenger"]
-    facebookMessengerPD = facebookMessengerPD.drop("Entries", axis=1).join(
-        facebookMessengerPD["Entries"].str.split("\n", expand=True)
-    )
+    facebookMessengerPD = extractFields(appPD, appFields["Facebook Messenger"])
     facebookMessengerPD = facebookMessengerPD.reset_index(drop=True)
 
-    selected_cols = []
-    for x in facebookMessengerPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def phoneCheck(facebookMessengerPD):
-        for x in selected_cols:
-            facebookMessengerPD.loc[
-                (facebookMessengerPD[x].str.contains("User ID-Facebook Id", na=False)),
-                "Account ID",
-            ] = facebookMessengerPD[x].str.split(":", n=1, expand=True)[1]
-            facebookMessengerPD.loc[
-                (facebookMessengerPD[x].str.contains("User ID-Username", na=False)),
-                "User Name",
-            ] = facebookMessengerPD[x].str.split(":", n=1, expand=True)[1]
-
-    phoneCheck(facebookMessengerPD)
-
     facebookMessengerPD["Source"] = "Messenger"
-    facebookMessengerPD[originIMEI] = phoneData.IMEI
-    facebookMessengerPD["inputFile"] = phoneData.inFile
-    facebookMessengerPD["Provenance"] = phoneData.inProvenance
-
-    exportCols = []
-    for x in facebookMessengerPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
+    facebookMessengerPD[originIMEI] = constantColumn(
+        phone.IMEI, len(facebookMessengerPD)
+    )
+    facebookMessengerPD["inputFile"] = constantColumn(
+        phone.inFile, len(facebookMessengerPD)
+    )
+    facebookMessengerPD["Provenance"] = constantColumn(
+        phone.inProvenance, len(facebookMessengerPD)
+    )
+
     print(
         "{} user accounts located".format(len(facebookMessengerPD["Account"].unique()))
     )
     print("{} contacts located".format(len(facebookMessengerPD["Account ID"].unique())))
-    print("Exporting {}-FB-MESSENGER.csv".format(phoneData.inFile))
-    logging.info("Exporting FB messenger from {}".format(phoneData.inFile))
+    print("Exporting {}-FB-MESSENGER.csv".format(phone.inFile))
+    logging.info("Exporting FB messenger from {}".format(phone.inFile))
     try:
-        facebookMessengerPD[exportCols].to_csv(
-            "{}-FB-MESSENGER.csv".format(phoneData.inFile),
-            index=False,
+        exportCSV(
+            facebookMessengerPD, "{}-FB-MESSENGER.csv".format(phone.inFile), phone
         )
     except Exception as e:
         print(e)
 
 
 # ----- Parse Instagram data ------------------------------------------------------------------
-def processInstagram(contactsPD):
+def processInstagram(appPD, phone):
     print("\nProcessing Instagram")
-    instagramPD = contactsPD[contactsPD["Source"] == "Instagram"].copy()
-    instagramPD = instagramPD.drop("Entries", axis=1).join(
-        instagramPD["Entries"].str.split("\n", expand=True)
-    )
+    instagramPD = extractFields(appPD, appFields["Instagram"])
 
-    selected_cols = []
-    for x in instagramPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
+    instagramPD[originIMEI] = constantColumn(phone.IMEI, len(instagramPD))
+    instagramPD["inputFile"] = constantColumn(phone.inFile, len(instagramPD))
 
-    def instaContacts(instagramPD):
-        for x in selected_cols:
-            instagramPD.loc[
-                (instagramPD[x].str.contains("User ID-Username", na=False)), "User Name"
-            ] = instagramPD[x].str.split(":", n=1, expand=True)[1]
-            instagramPD.loc[
-                (instagramPD[x].str.contains("User ID-Instagram Id", na=False)),
-                "Instagram ID",
-            ] = instagramPD[x].str.split(":", n=1, expand=True)[1]
-
-    instaContacts(instagramPD)
-
-    instagramPD[originIMEI] = phoneData.IMEI
-    instagramPD["inputFile"] = phoneData.inFile
-
-    exportCols = []
-    for x in instagramPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
     print("{} Instagram contacts located".format(len(instagramPD["Name"])))
-    print("Exporting {}-INSTAGRAM.csv".format(phoneData.inFile))
-    logging.info("Exporting Instagram from {}".format(phoneData.inFile))
+    print("Exporting {}-INSTAGRAM.csv".format(phone.inFile))
+    logging.info("Exporting Instagram from {}".format(phone.inFile))
     # TODO - Fix column handling
-    instagramPD[exportCols].to_csv(
-        "{}-INSTAGRAM.csv".format(phoneData.inFile),
-        index=False,
-    )
+    exportCSV(instagramPD, "{}-INSTAGRAM.csv".format(phone.inFile), phone)
 
 
 # ---- Process Line -----------------------------------------------------------------------
-def processLine(contactsPD):
+def processLine(appPD, phone):
     print("Processing Line")
-    linePD = contactsPD[contactsPD["Source"] == "Line"].copy()
-    linePD = linePD.drop("Entries", axis=1).join(
-        linePD["Entries"].str.split("\n", expand=True)
-    )
+    linePD = extractFields(appPD, appFields["Line"])
     linePD = linePD.reset_index(drop=True)
 
-    selected_cols = []
-    for x in linePD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def processLine(LinePD):
-        for x in selected_cols:
-            LinePD.loc[
-                (LinePD[x].str.contains("User ID-Address Book Name:", na=False)),
-                "LineAddressBook",
-            ] = LinePD[x].str.split(":", n=1, expand=True)[1]
-
-            LinePD.loc[
-                (LinePD[x].str.contains("User ID-User ID:", na=False)),
-                "LineUserID",
-            ] = LinePD[x].str.split(":", n=1, expand=True)[1]
-            LinePD.loc[
-                (LinePD[x].str.contains("User ID-Server:", na=False)),
-                "LineServerID",
-            ] = LinePD[x].str.split(":", n=1, expand=True)[1]
-
-    processLine(linePD)
-
-    linePD[originIMEI] = phoneData.IMEI
-    linePD["inputFile"] = phoneData.inFile
-    exportCols = []
-
-    for x in linePD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
+    linePD[originIMEI] = constantColumn(phone.IMEI, len(linePD))
+    linePD["inputFile"] = constantColumn(phone.inFile, len(linePD))
 
     print("{} Line contacts located".format(len(linePD["Name"])))
-    print("Exporting {}-LINE.csv".format(phoneData.inFile))
-    logging.info("Exporting Line contacts from {}".format(phoneData.inFile))
-    linePD[exportCols].to_csv("{}-LINE.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-LINE.csv".format(phone.inFile))
+    logging.info("Exporting Line contacts from {}".format(phone.inFile))
+    exportCSV(linePD, "{}-LINE.csv".format(phone.inFile), phone)
 
 
 # ------------Process native contact list ------------------------------------------------
-def processAppleNative(contactsPD):
+def processAppleNative(appPD, phone):
 
     print("\nProcessing Native Contacts")
-    # nativeContactsPD = contactsPD[contactsPD["Source"].isna()]
-
     # Contacts are stored with either null (iPhone) or "Phone" for Android
-    nativeContactsPD = contactsPD[
-        (contactsPD.Source.isna()) | (contactsPD.Source == "Phone")
-    ].copy()
+    nativeContactsPD = appPD.copy()
 
     # Fill NaN values with : to prevent error with blank entries.
     nativeContactsPD.Entries = nativeContactsPD.Entries.fillna(":")
 
     nativeContactsPD = nativeContactsPD.drop("Entries", axis=1).join(
-        nativeContactsPD["Entries"]
-        .str.split("\n", expand=True)
-        .stack()
-        .reset_index(level=1, drop=True)
-        .rename("Entries")
+        nativeContactsPD["Entries"].str.split("\n").explode()
     )
 
     # nativeContactsPD = nativeContactsPD[["Name", "Interaction Statuses", "Entries"]]
@@ -590,105 +3317,85 @@ def processAppleNative(contactsPD):
     nativeContactsPD = nativeContactsPD[
         nativeContactsPD["Entries"].str.contains(r"Phone-")
     ]
-    nativeContactsPD[originIMEI] = phoneData.IMEI
-    nativeContactsPD["inputFile"] = phoneData.inFile
-    nativeContactsPD["Provenance"] = phoneData.inProvenance
-
-    # Remove erroneous characters, need to make this a regex
-    # TODO Use a regex to tidy this up.
-    nativeContactsPD["Entries"] = (
-        nativeContactsPD["Entries"]
-        .str.split(":", n=1, expand=True)[1]
-        .str.strip()
-        .str.replace(" ", "", regex=False)
-        .str.replace("-", "", regex=False)
-        .str.replace("+", "", regex=False)
-        # Fix issue with inseyets reports
-        .str.replace("Message", "", regex=False)
-        .str.replace("(", "", regex=False)
-        .str.replace(")", "", regex=False)
+    nativeContactsPD[originIMEI] = constantColumn(phone.IMEI, len(nativeContactsPD))
+    nativeContactsPD["inputFile"] = constantColumn(phone.inFile, len(nativeContactsPD))
+    nativeContactsPD["Provenance"] = constantColumn(
+        phone.inProvenance, len(nativeContactsPD)
     )
 
-    if ausNormal:
-        nativeContactsPD["Entries"] = nativeContactsPD["Entries"].str.replace(
-            r"\+614", "04", regex=True
-        )
+    # Remove erroneous characters and resolve the numbers
+    phonesPD = normalisePhones(
+        nativeContactsPD["Entries"].str.split(":", n=1, expand=True)[1]
+    )
+    nativeContactsPD["Entries"] = phoneColumn(phonesPD)
+    nativeContactsPD["E164"] = phonesPD["E164"]
 
     if debug:
         print(nativeContactsPD)
 
     # nativeContactsPD = nativeContactsPD[[originIMEI, "Name", "Entries", "Interaction Statuses"]]
     print("{} contacts located.".format(len(nativeContactsPD)))
-    print("Exporting {}-NATIVE.csv".format(phoneData.inFile))
-    logging.info("Exporting Native contacts from {}".format(phoneData.inFile))
-    nativeContactsPD.to_csv("{}-NATIVE.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-NATIVE.csv".format(phone.inFile))
+    logging.info("Exporting Native contacts from {}".format(phone.inFile))
+    exportCSV(nativeContactsPD, "{}-NATIVE.csv".format(phone.inFile), phone)
 
 
 # Process Outlook Contacts
-def processOutlookContacts(contactsPD):
+def processOutlookContacts(appPD, phone):
     print("\nProcessing Outlook Contacts")
 
-    outlookContactsPD = contactsPD[(contactsPD.Source == "Outlook")].copy()
+    outlookContactsPD = appPD.copy()
     # Fill NaN values with : to prevent error with blank entries.
     outlookContactsPD.Entries = outlookContactsPD.Entries.fillna(":")
 
     outlookContactsPD = outlookContactsPD.drop("Entries", axis=1).join(
-        outlookContactsPD["Entries"]
-        .str.split("\n", expand=True)
-        .stack()
-        .reset_index(level=1, drop=True)
-        .rename("Entries")
+        outlookContactsPD["Entries"].str.split("\n").explode()
     )
 
     outlookContactsPD = outlookContactsPD[["Account", "Name", "Entries", "Source"]]
-    outlookContactsPD[originIMEI] = phoneData.IMEI
-    outlookContactsPD["inputFile"] = phoneData.inFile
-    outlookContactsPD["Provenance"] = phoneData.inProvenance
+    outlookContactsPD[originIMEI] = constantColumn(phone.IMEI, len(outlookContactsPD))
+    outlookContactsPD["inputFile"] = constantColumn(
+        phone.inFile, len(outlookContactsPD)
+    )
+    outlookContactsPD["Provenance"] = constantColumn(
+        phone.inProvenance, len(outlookContactsPD)
+    )
 
     outlookContactsPD["Entries"] = (
         outlookContactsPD["Entries"].str.split(":", n=1, expand=True)[1].str.strip()
     )
 
     print("{} contacts located.".format(len(outlookContactsPD)))
-    print("Exporting {}-OUTLOOK.csv".format(phoneData.inFile))
-    logging.info("Exporting Native contacts from {}".format(phoneData.inFile))
-    outlookContactsPD.to_csv("{}-OUTLOOK.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-OUTLOOK.csv".format(phone.inFile))
+    logging.info("Exporting Native contacts from {}".format(phone.inFile))
+    exportCSV(outlookContactsPD, "{}-OUTLOOK.csv".format(phone.inFile), phone)
 
 
 # ----------- Parse Recents -----------------------------------------------------------------------
-def processRecents(contactsPD):
+def processRecents(appPD, phone):
     print("\nProcessing Recents")
-    recentsPD = contactsPD[contactsPD["Source"] == "Recents"].copy()
+    recentsPD = appPD.copy()
     recentsPD.Entries = recentsPD.Entries.fillna(":")
     recentsPD = recentsPD[recentsPD["Entries"].str.contains(r"Phone-")]
 
-    recentsPD[originIMEI] = phoneData.IMEI
-    recentsPD["inputFile"] = phoneData.inFile
-    recentsPD["Provenance"] = phoneData.inProvenance
-
-    recentsPD["Entries"] = (
-        recentsPD["Entries"]
-        .str.split(":", n=1, expand=True)[1]
-        .str.strip()
-        .str.replace(" ", "")
-        .str.replace("-", "")
-        # .str.replace("+","",regex=False)
-    )
-    if ausNormal:
-        recentsPD["Entries"] = recentsPD["Entries"].str.replace(
-            r"\+614", "04", regex=True
-        )
+    recentsPD[originIMEI] = constantColumn(phone.IMEI, len(recentsPD))
+    recentsPD["inputFile"] = constantColumn(phone.inFile, len(recentsPD))
+    recentsPD["Provenance"] = constantColumn(phone.inProvenance, len(recentsPD))
+
+    phonesPD = normalisePhones(recentsPD["Entries"].str.split(":", n=1, expand=True)[1])
+    recentsPD["Entries"] = phoneColumn(phonesPD)
+    recentsPD["E164"] = phonesPD["E164"]
 
     print("{} recent contacts located.".format(len(recentsPD)))
-    print("Exporting {}-RECENT.csv".format(phoneData.inFile))
-    logging.info("Exporting recent contacts from {}".format(phoneData.inFile))
-    recentsPD.to_csv("{}-RECENTS.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-RECENT.csv".format(phone.inFile))
+    logging.info("Exporting recent contacts from {}".format(phone.inFile))
+    exportCSV(recentsPD, "{}-RECENTS.csv".format(phone.inFile), phone)
 
 
 # ------------Parse Signal contacts ---------------------------------------------------------------
-def processSignal(contactsPD):
+def processSignal(appPD, phone):
     print("\nProcessing Signal Contacts")
-    signalPD = contactsPD[contactsPD["Source"] == "Signal"].copy()
+    signalPD = appPD.copy()
     signalPD = signalPD[["Name", "Entries", "Source"]]
     signalPD = signalPD.drop("Entries", axis=1).join(
         signalPD["Entries"].str.split("\n", expand=True)
@@ -719,137 +3426,57 @@ def processSignal(contactsPD):
 
     signalContact(signalPD)
 
-    signalPD[originIMEI] = phoneData.IMEI
-    signalPD["inputFile"] = phoneData.inFile
-    signalPD["Provenance"] = phoneData.inProvenance
+    signalPD[originIMEI] = constantColumn(phone.IMEI, len(signalPD))
+    signalPD["inputFile"] = constantColumn(phone.inFile, len(signalPD))
+    signalPD["Provenance"] = constantColumn(phone.inProvenance, len(signalPD))
 
     export_cols = [originIMEI, "Name", "User Name"]
     export_cols.extend(selected_cols)
     print("Located {} Signal contacts".format(len(signalPD["Name"])))
-    print("Exporting {}-SIGNAL.csv".format(phoneData.inFile))
-    logging.info("Exporting Signal messenger from {}".format(phoneData.inFile))
-    signalPD.to_csv(
-        "{}-SIGNAL.csv".format(phoneData.inFile), index=False, columns=export_cols
+    print("Exporting {}-SIGNAL.csv".format(phone.inFile))
+    logging.info("Exporting Signal messenger from {}".format(phone.inFile))
+    exportCSV(
+        signalPD, "{}-SIGNAL.csv".format(phone.inFile), phone, columns=export_cols
     )
 
 
 # ----------- Parse Signal Private Messenger--------------------------------------------------------
-def processSignalPrivateMessenger(contactsPD):
+def processSignalPrivateMessenger(appPD, phone):
     print("\nProcessing Signal Private Messenger")
-    spmPD = contactsPD[contactsPD["Source"] == "Signal Private Messenger"].copy()
-    spmPD = spmPD.drop("Entries", axis=1).join(
-        spmPD["Entries"].str.split("\n", expand=True)
-    )
-    # spmPD['Entries'].tolist()
-    # spmPD.explode('Entries')
-    # spmPD = spmPD.reset_index(drop=True)
-    spmPD[originIMEI] = phoneData.IMEI
-    spmPD["inputFile"] = phoneData.inFile
-    spmPD["Provenance"] = phoneData.inProvenance
+    spmPD = extractFields(appPD, appFields["Signal Private Messenger"])
 
-    selected_cols = []
-    for x in spmPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def spmContacts(spmPD):
-        for x in selected_cols:
-            try:
-                spmPD.loc[(spmPD[x].str.contains("Phone-:", na=False)), "Phone"] = (
-                    spmPD[x].str.split(":", n=1, expand=True)[1]
-                )
-            except:
-                pass
-            try:
-                spmPD.loc[(spmPD[x].str.contains("User ID-:", na=False)), "User-ID"] = (
-                    spmPD[x].str.split(":", n=1, expand=True)[1]
-                )
-            except:
-                pass
-            try:
-                spmPD.loc[
-                    (spmPD[x].str.contains("User ID-Nickname:", na=False)),
-                    "User-ID-Nickname",
-                ] = spmPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-            try:
-                spmPD.loc[
-                    (spmPD[x].str.contains("User ID-Username:", na=False)),
-                    "User-ID-Username",
-                ] = spmPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-            try:
-                spmPD.loc[
-                    (spmPD[x].str.contains("User ID-ProfileKey:", na=False)),
-                    "User-ID-ProfileKey",
-                ] = spmPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-    spmContacts(spmPD)
-    # spmPD.info()
-
-    exportCols = []
-    # Remove column from previous step
-    for x in spmPD.columns:
-        if isinstance(x, str):
-            # if x !="Provenence" or x != 'originIMEI' or x != 'inputFile':
-            if x not in ["Provenance", "originIMEI", "inputFile"]:
-                exportCols.append(x)
-
-    exportCols.extend(["originIMEI", "inputFile", "Provenance"])
+    spmPD[originIMEI] = constantColumn(phone.IMEI, len(spmPD))
+    spmPD["inputFile"] = constantColumn(phone.inFile, len(spmPD))
+    spmPD["Provenance"] = constantColumn(phone.inProvenance, len(spmPD))
 
     print("Located {} Signal Private Messenger contacts.".format(len(spmPD["Name"])))
-    print("Exporting {}-Signal-PM.csv".format(phoneData.inFile))
-    logging.info("Exporting Signal Private Messenger from {}".format(phoneData.inFile))
-    spmPD[exportCols].to_csv("{}-Signal-PM.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-Signal-PM.csv".format(phone.inFile))
+    logging.info("Exporting Signal Private Messenger from {}".format(phone.inFile))
+    exportCSV(spmPD, "{}-Signal-PM.csv".format(phone.inFile), phone)
 
 
 # ----------- Parse Snapchat data ------------------------------------------------------------------
-def processSnapChat(contactsPD):
+def processSnapChat(appPD, phone):
     print("\nProcessing Snapchat")
-    snapPD = contactsPD[contactsPD["Source"] == "Snapchat"]
-    snapPD = snapPD[["Name", "Entries", "Source"]]
+    snapPD = appPD[["Name", "Entries", "Source"]]
 
     # Extract nested entities
-    snapPD = snapPD.drop("Entries", axis=1).join(
-        snapPD["Entries"].str.split("\n", expand=True)
-    )
-    selected_cols = []
-    for x in snapPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
+    snapPD = extractFields(snapPD, appFields["Snapchat"])
+
+    snapPD[originIMEI] = constantColumn(phone.IMEI, len(snapPD))
+    snapPD["inputFile"] = constantColumn(phone.inFile, len(snapPD))
+    snapPD["Provenance"] = constantColumn(phone.inProvenance, len(snapPD))
 
-    def snapContacts(snapPD):
-        for x in selected_cols:
-            snapPD.loc[
-                (snapPD[x].str.contains("User ID-Username", na=False)), "User Name"
-            ] = snapPD[x].str.split(":", n=1, expand=True)[1]
-            snapPD.loc[
-                (snapPD[x].str.contains("User ID-User ID", na=False)), "User ID"
-            ] = snapPD[x].str.split(":", n=1, expand=True)[1]
-
-    snapContacts(snapPD)
-
-    snapPD[originIMEI] = phoneData.IMEI
-    snapPD["inputFile"] = phoneData.inFile
-    snapPD["Provenance"] = phoneData.inProvenance
-
-    exportCols = []
-    for x in snapPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
     if debug:
-        print(snapPD[exportCols])
+        print(snapPD)
 
     print("{} Snapchat contacts located.".format(len(snapPD)))
-    print("Exporting {}-SNAPCHAT.csv".format(phoneData.inFile))
-    logging.info("Exporting Snapchat from {}".format(phoneData.inFile))
-    snapPD[exportCols].to_csv(
-        "{}-SNAPCHAT.csv".format(phoneData.inFile),
-        index=False,
+    print("Exporting {}-SNAPCHAT.csv".format(phone.inFile))
+    logging.info("Exporting Snapchat from {}".format(phone.inFile))
+    exportCSV(
+        snapPD,
+        "{}-SNAPCHAT.csv".format(phone.inFile),
+        phone,
         columns=[
             originIMEI,
             "Name",
@@ -863,161 +3490,46 @@ def processSnapChat(contactsPD):
 
 
 # ---- Parse Telegram Contacts--------------------------------------------------------------
-def processTelegram(contactsPD):
+def processTelegram(appPD, phone):
     print("\nProcessing Telegram")
-    telegramPD = contactsPD[contactsPD["Source"] == "Telegram"].copy()
-    telegramPD = telegramPD.drop("Entries", axis=1).join(
-        telegramPD["Entries"].str.split("\n", expand=True)
-    )
+    telegramPD = extractFields(appPD, appFields["Telegram"])
     telegramPD = telegramPD.reset_index(drop=True)
 
-    selected_cols = []
-    for x in telegramPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def phoneCheck(telegramPD):
-        for x in selected_cols:
-            telegramPD.loc[
-                (telegramPD[x].str.contains("Phone-", na=False)), "Phone-Number"
-            ] = telegramPD[x].str.split(":", n=1, expand=True)[1]
-
-            telegramPD.loc[
-                (telegramPD[x].str.contains("User ID-Peer", na=False)), "Peer-ID"
-            ] = telegramPD[x].str.split(":", n=1, expand=True)[1]
-
-            telegramPD.loc[
-                (telegramPD[x].str.contains("User ID-Username", na=False)), "User-Name"
-            ] = telegramPD[x].str.split(":", n=1, expand=True)[1]
-
-    phoneCheck(telegramPD)
-
-    telegramPD[originIMEI] = phoneData.IMEI
-    telegramPD["inputFile"] = phoneData.inFile
-    telegramPD["Provenance"] = phoneData.inProvenance
+    telegramPD[originIMEI] = constantColumn(phone.IMEI, len(telegramPD))
+    telegramPD["inputFile"] = constantColumn(phone.inFile, len(telegramPD))
+    telegramPD["Provenance"] = constantColumn(phone.inProvenance, len(telegramPD))
     telegramPD["source"] = "Telegram"
-    exportCols = []
-    for x in telegramPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
+
     # Export CSV
     print("{} Telegram contacts located.".format(len(telegramPD)))
-    print("Exporting {}-TELEGRAM.csv".format(phoneData.inFile))
-    logging.info("Exporting Telegram from {}".format(phoneData.inFile))
-    telegramPD[exportCols].to_csv(
-        "{}-TELEGRAM.csv".format(phoneData.inFile), index=False
-    )
+    print("Exporting {}-TELEGRAM.csv".format(phone.inFile))
+    logging.info("Exporting Telegram from {}".format(phone.inFile))
+    exportCSV(telegramPD, "{}-TELEGRAM.csv".format(phone.inFile), phone)
 
 
 # ------ Parse Threema Contacts -----------------------------------------------------------------
-def processThreema(contactsPD):
+def processThreema(appPD, phone):
     print("\nProcessing Threema")
-    threemaPD = contactsPD[contactsPD["Source"] == "Threema"].copy()
-    threemaPD = threemaPD.drop("Entries", axis=1).join(
-        threemaPD["Entries"].str.split("\n", expand=True)
-    )
+    threemaPD = extractFields(appPD, appFields["Threema"])
     threemaPD = threemaPD.reset_index(drop=True)
 
-    selected_cols = []
-    for x in threemaPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
+    threemaPD[originIMEI] = constantColumn(phone.IMEI, len(threemaPD))
+    threemaPD["inputFile"] = constantColumn(phone.inFile, len(threemaPD))
+    threemaPD["Provenance"] = constantColumn(phone.inProvenance, len(threemaPD))
 
-    def ThreemaParse(ThreemaPD):
-        for x in selected_cols:
-            try:
-                ThreemaPD.loc[
-                    (ThreemaPD[x].str.contains("User ID-identity:", na=False)),
-                    "Threema ID",
-                ] = ThreemaPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-            try:
-                ThreemaPD.loc[
-                    (ThreemaPD[x].str.contains("User ID-Username:", na=False)),
-                    "ThreemaUsername",
-                ] = ThreemaPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-    ThreemaParse(threemaPD)
-
-    threemaPD[originIMEI] = phoneData.IMEI
-    threemaPD["inputFile"] = phoneData.inFile
-    threemaPD["Provenance"] = phoneData.inProvenance
-
-    exportCols = []
-    for x in threemaPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
-
-    print("Exporting {}-THREEMA.csv".format(phoneData.inFile))
-    logging.info("Exporting Threema from {}".format(phoneData.inFile))
-    threemaPD[exportCols].to_csv("{}-THREEMA.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-THREEMA.csv".format(phone.inFile))
+    logging.info("Exporting Threema from {}".format(phone.inFile))
+    exportCSV(threemaPD, "{}-THREEMA.csv".format(phone.inFile), phone)
 
 
 ## Parse WeChat Contacts ------------------------------------------------------------------------
-def processWeChat(contactsPD):
+def processWeChat(appPD, phone):
     print("\nProcessing WeChat")
-    WeChatPD = contactsPD[contactsPD["Source"] == "WeChat"].copy()
-    WeChatPD = WeChatPD.drop("Entries", axis=1).join(
-        WeChatPD["Entries"].str.split("\n", expand=True)
-    )
+    # FIXME Usernames that contain @stranger???
+    WeChatPD = extractFields(appPD, appFields["WeChat"])
 
     WeChatPD = WeChatPD.reset_index(drop=True)
 
-    selected_cols = []
-    for x in WeChatPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def WeChatContacts(WeChatPD):
-
-        for x in selected_cols:
-            # FIXME Usernames that contain @stranger???
-            # FIXME Try / Except / Pass
-
-            try:
-                WeChatPD.loc[
-                    (WeChatPD[x].str.contains("User ID-WeChat ID:", na=False)),
-                    "WeChatID",
-                ] = WeChatPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-            try:
-                WeChatPD.loc[
-                    (WeChatPD[x].str.contains("User ID-QQ:", na=False)), "QQ User ID"
-                ] = WeChatPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-            try:
-                WeChatPD.loc[
-                    (WeChatPD[x].str.contains("User ID-Username:", na=False)),
-                    "Username",
-                ] = WeChatPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-            try:
-                WeChatPD.loc[
-                    (WeChatPD[x].str.contains("User ID-LinkedIn ID:", na=False)),
-                    "LinkedIn ID",
-                ] = WeChatPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-            try:
-                WeChatPD.loc[
-                    (WeChatPD[x].str.contains("User ID-Facebook ID:", na=False)),
-                    "Facebook ID",
-                ] = WeChatPD[x].str.split(":", n=1, expand=True)[1]
-            except:
-                pass
-
-    WeChatContacts(WeChatPD)
-
     # Repalace we chat ID's with @ stranhger with blank values as are not we chat user IDs
     try:
         WeChatPD.WeChatID = WeChatPD.WeChatID.apply(
@@ -1028,27 +3540,22 @@ def processWeChat(contactsPD):
         print(WeChatPD.WeChatID)
         pass
 
-    WeChatPD[originIMEI] = phoneData.IMEI
-    WeChatPD["inputFile"] = phoneData.inFile
-    WeChatPD["Provenance"] = phoneData.inProvenance
+    WeChatPD[originIMEI] = constantColumn(phone.IMEI, len(WeChatPD))
+    WeChatPD["inputFile"] = constantColumn(phone.inFile, len(WeChatPD))
+    WeChatPD["Provenance"] = constantColumn(phone.inProvenance, len(WeChatPD))
     WeChatPD["Source"] = "Weixin"
 
-    # Export Columns where the title is a string to drop working columns
-    exportCols = []
-    for x in WeChatPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
     print("Located {} WeChat contacts.".format(len(WeChatPD["WeChatID"])))
-    print("Exporting {}-WECHAT.csv".format(phoneData.inFile))
-    logging.info("Exporting WeChat from {}".format(phoneData.inFile))
-    WeChatPD[exportCols].to_csv("{}-WECHAT.csv".format(phoneData.inFile), index=False)
+    print("Exporting {}-WECHAT.csv".format(phone.inFile))
+    logging.info("Exporting WeChat from {}".format(phone.inFile))
+    exportCSV(WeChatPD, "{}-WECHAT.csv".format(phone.inFile), phone)
 
 
 # ---Parse Whatsapp Contacts----------------------------------------------------------------------
 # Load WhatsApp
-def processWhatsapp(contactsPD):
+def processWhatsapp(appPD, phone):
     print("\nProcessing WhatsApp")
-    whatsAppPD = contactsPD[contactsPD["Source"] == "WhatsApp"].copy()
+    whatsAppPD = appPD.copy()
     try:
         whatsAppPD = whatsAppPD[["Name", "Entries", "Source", "Interaction Statuses"]]
         # Datatype needs to be object not float to allow filtering by string without throwing an error
@@ -1073,139 +3580,105 @@ def processWhatsapp(contactsPD):
         ]
 
     # Unpack nested data
-    whatsAppPD = whatsAppPD.drop("Entries", axis=1).join(
-        whatsAppPD["Entries"].str.split("\n", expand=True)
-    )
-
-    # Data is expanded into colums with Integer names, check for these columns and add them to a
-    # list to allow for different width sheets.
-    colList = list(whatsAppPD)
-    selected_cols = []
-    for x in colList:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    # Look for data across expanded columns and shift it to output columns.
-    def whatsappContactProcess(whatsAppPD):
-        for x in selected_cols:
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("Phone-Mobile", na=False)), "Phone-Mobile"
-            ] = (
-                whatsAppPD[x]
-                .str.split(":", n=1, expand=True)[1]
-                .str.replace(" ", "")
-                .str.replace("-", "")
-            )
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("Phone-:", na=False)), "Phone"
-            ] = (
-                whatsAppPD[x]
-                .str.split(":", n=1, expand=True)[1]
-                .str.replace(" ", "")
-                .str.replace("-", "")
-            )
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("Phone-Home:", na=False)), "Phone-Home"
-            ] = (
-                whatsAppPD[x]
-                .str.split(":", n=1, expand=True)[1]
-                .str.replace(" ", "")
-                .str.replace("-", "")
-            )
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("User ID-Push Name", na=False)), "Push-ID"
-            ] = whatsAppPD[x].str.split(":", n=1, expand=True)[1]
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("User ID-Id", na=False)), "Id-ID"
-            ] = whatsAppPD[x].str.split(":", n=1, expand=True)[1]
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("User ID-WhatsApp User Id", na=False)),
-                "WhatsApp-ID",
-            ] = whatsAppPD[x].str.split(":", n=1, expand=True)[1]
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("Web address-Professional", na=False)),
-                "BusinessWebsite",
-            ] = whatsAppPD[x].str.split(":", n=1, expand=True)[1]
-
-            whatsAppPD.loc[
-                (whatsAppPD[x].str.contains("Email-Professional", na=False)),
-                "Business-Email",
-            ] = whatsAppPD[x].str.split(":", n=1, expand=True)[1]
+    whatsAppPD = extractFields(whatsAppPD, appFields["WhatsApp"])
 
-    whatsappContactProcess(whatsAppPD)
+    # Remove spacing from phone numbers, the E.164 and national forms are added alongside
+    for x in ["Phone-Mobile", "Phone", "Phone-Home"]:
+        phonesPD = normalisePhones(whatsAppPD[x])
+        whatsAppPD[x] = phonesPD["Cleaned"]
+        whatsAppPD["{}-E164".format(x)] = phonesPD["E164"]
+        whatsAppPD["{}-National".format(x)] = phonesPD["National"]
 
     # Add IMEI Column
-    whatsAppPD[originIMEI] = phoneData.IMEI
-    whatsAppPD["inputFile"] = phoneData.inFile
-    whatsAppPD["Provenance"] = phoneData.inProvenance
+    whatsAppPD[originIMEI] = constantColumn(phone.IMEI, len(whatsAppPD))
+    whatsAppPD["inputFile"] = constantColumn(phone.inFile, len(whatsAppPD))
+    whatsAppPD["Provenance"] = constantColumn(phone.inProvenance, len(whatsAppPD))
     whatsAppPD["Source"] = "Whatsapp"
 
-    # Remove working columns.
-    exportCols = []
-    for x in whatsAppPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
     if debug:
-        print(exportCols)
+        print(list(whatsAppPD.columns))
 
     # Export CSV
     print("{} WhatsApp contacts located".format(len(whatsAppPD["Name"])))
-    print("Exporting {}-WHATSAPP.csv".format(phoneData.inFile))
-    logging.info("Exporting Whatsapp from {}".format(phoneData.inFile))
-    whatsAppPD[exportCols].to_csv(
-        "{}-WHATSAPP.csv".format(phoneData.inFile), index=False
-    )
+    print("Exporting {}-WHATSAPP.csv".format(phone.inFile))
+    logging.info("Exporting Whatsapp from {}".format(phone.inFile))
+    exportCSV(whatsAppPD, "{}-WHATSAPP.csv".format(phone.inFile), phone)
 
 
 # --- Parse Zalo Contacts --------------------------------------------------------------------
-def processZalo(contactsPD):
+def processZalo(appPD, phone):
     print("\nProcessinf Zalo")
-    ZaloPD = contactsPD[contactsPD["Source"] == "Zalo"]
-    ZaloPD = ZaloPD.drop("Entries", axis=1).join(
-        ZaloPD["Entries"].str.split("\n", expand=True)
-    )
-    selected_cols = []
-    for x in ZaloPD.columns:
-        if isinstance(x, int):
-            selected_cols.append(x)
-
-    def processZaloContacts(ZaloPD):
-        for x in selected_cols:
-            ZaloPD.loc[
-                (ZaloPD[x].str.contains("User ID-User Name:", na=False)),
-                "ZaloUserName",
-            ] = ZaloPD[x].str.split(":", n=1, expand=True)[1]
-
-            ZaloPD.loc[
-                (ZaloPD[x].str.contains("User ID-Id:", na=False)),
-                "ZaloUserID",
-            ] = ZaloPD[x].str.split(":", n=1, expand=True)[1]
-
-    processZaloContacts(ZaloPD)
-
-    ZaloPD[originIMEI] = phoneData.IMEI
-    ZaloPD["inputFile"] = phoneData.inFile
-    ZaloPD["Provenance"] = phoneData.inProvenance
+    ZaloPD = extractFields(appPD, appFields["Zalo"])
+
+    ZaloPD[originIMEI] = constantColumn(phone.IMEI, len(ZaloPD))
+    ZaloPD["inputFile"] = constantColumn(phone.inFile, len(ZaloPD))
+    ZaloPD["Provenance"] = constantColumn(phone.inProvenance, len(ZaloPD))
+
+    print("Exporting {}-ZALO.csv".format(phone.inFile))
+    logging.info("Exporting Zalo from {}".format(phone.inFile))
+    exportCSV(ZaloPD, "{}-ZALO.csv".format(phone.inFile), phone)
+
+
+# ------ Parser registry -------------------------------------------------------------------------
+# Parsers are keyed by the value of the Source column and called with that app's rows and
+# the phoneData for the input file. Parsers for other apps can be added from outside this
+# module with clbExtract.registerParser("App Name", parserFunc). Those parsers are sent to
+# pool workers as "module:name" and imported there, so they must be defined at the top
+# level of an importable module.
+appParsers = {}
+externalParsers = {}
+
+
+def registerParser(source, parserFunc):
+    appParsers[source] = parserFunc
+    if source not in parsedApps:
+        parsedApps.append(source)
+    if parserFunc.__module__ != __name__:
+        externalParsers[source] = "{}:{}".format(
+            parserFunc.__module__, parserFunc.__qualname__
+        )
 
-    exportCols = []
-    for x in ZaloPD.columns:
-        if isinstance(x, str):
-            exportCols.append(x)
 
-    print("Exporting {}-ZALO.csv".format(phoneData.inFile))
-    logging.info("Exporting Zalo from {}".format(phoneData.inFile))
-    ZaloPD[exportCols].to_csv("{}-ZALO.csv".format(phoneData.inFile), index=False)
+# Registers the parsers of other modules in a pool worker, workers started with spawn (eg.
+# on Windows) only import this module
+def loadExternalParsers(parserNames):
+    for source, parserName in list(parserNames.items()):
+        moduleName, qualName = parserName.split(":", 1)
+        try:
+            parserFunc = importlib.import_module(moduleName)
+            for x in qualName.split("."):
+                parserFunc = getattr(parserFunc, x)
+        except (ImportError, AttributeError) as e:
+            logging.warning(
+                "Parser for {} could not be loaded in a worker - {}".format(source, e)
+            )
+            continue
+        registerParser(source, parserFunc)
+
+
+# Native contacts are listed as "Native" in parsedApps
+appParsers["Phone"] = processAppleNative
+registerParser("Facebook Messenger", processFacebookMessenger)
+registerParser("Instagram", processInstagram)
+registerParser("Line", processLine)
+registerParser("Outlook", processOutlookContacts)
+registerParser("Recents", processRecents)
+registerParser("Signal", processSignal)
+registerParser("Signal Private Messenger", processSignalPrivateMessenger)
+registerParser("Snapchat", processSnapChat)
+registerParser("Telegram", processTelegram)
+registerParser("Threema", processThreema)
+registerParser("WeChat", processWeChat)
+registerParser("WhatsApp", processWhatsapp)
+registerParser("Zalo", processZalo)
 
 
 # ------- Argument parser for command line arguments -----------------------------------------
 
 if __name__ == "__main__":
+    # Required for the bulk processing pool when built with PyInstaller
+    multiprocessing.freeze_support()
+
     parser = argparse.ArgumentParser(
         description=__description__,
         epilog="Developed by {}".format(str(__author__), str(__version__)),
@@ -1236,15 +3709,258 @@ if __name__ == "__main__":
         help="Bulk process Excel spreadsheets in working directory.",
     )
 
+    parser.add_argument(
+        "-c",
+        "--chunk",
+        dest="chunkSize",
+        type=int,
+        required=False,
+        help="Stream the Contacts tab in chunks of this many rows to limit memory use.",
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        type=int,
+        required=False,
+        help="Number of files to process in parallel in bulk mode.",
+    )
+
+    parser.add_argument(
+        "--cache",
+        dest="useCache",
+        required=False,
+        action="store_true",
+        help="Read and write the Parquet cache of parsed sheets.",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        dest="noCache",
+        required=False,
+        action="store_true",
+        help="Do not read or write the Parquet cache of parsed sheets, the default.",
+    )
+
+    parser.add_argument(
+        "--purge-cache",
+        dest="purgeCache",
+        required=False,
+        action="store_true",
+        help="Empty the Parquet cache of parsed sheets.",
+    )
+
+    parser.add_argument(
+        "-s",
+        "--store",
+        dest="contactStore",
+        required=False,
+        help="Also write every contact to one store, a SQLite database (.db) or Parquet folder.",
+    )
+
+    parser.add_argument(
+        "-r",
+        "--report",
+        dest="report",
+        required=False,
+        type=int,
+        nargs="?",
+        const=2,
+        help="Report identifiers found on at least this many devices (default 2) from the bulk index.",
+    )
+
+    parser.add_argument(
+        "-q",
+        "--query",
+        dest="query",
+        required=False,
+        help="List the devices and apps an identifier was found in from the bulk index.",
+    )
+
+    parser.add_argument(
+        "--full",
+        dest="fullRun",
+        required=False,
+        action="store_true",
+        help="Process every file in bulk mode, including files unchanged since the last run.",
+    )
+
+    parser.add_argument(
+        "--country",
+        dest="phoneCountry",
+        required=False,
+        choices=list(countryRules),
+        help="Country rules used to normalise phone numbers, default AU.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        dest="profileRun",
+        required=False,
+        action="store_true",
+        help="Record the time, CPU, rows and peak memory of each stage to {file}-PROFILE.json/.csv.",
+    )
+
+    parser.add_argument(
+        "--export-threads",
+        dest="exportThreads",
+        required=False,
+        type=int,
+        help="Threads writing outputs while parsing continues, default 2, 0 to write as each app is parsed.",
+    )
+
+    parser.add_argument(
+        "--export-memory",
+        dest="exportBudget",
+        required=False,
+        type=int,
+        help="MB of parsed data that may wait to be written before parsing pauses, default 512.",
+    )
+
+    parser.add_argument(
+        "--format",
+        dest="outputFormat",
+        required=False,
+        choices=outputFormats,
+        help="Format of the app outputs, default csv. parquet and arrow keep column types and need pyarrow.",
+    )
+
+    parser.add_argument(
+        "--watch",
+        dest="watchDir",
+        required=False,
+        help="Watch this intake folder and process workbooks as they arrive, until stopped with Ctrl+C.",
+    )
+
+    parser.add_argument(
+        "--cases",
+        dest="casesDir",
+        required=False,
+        default="clbExtract-cases",
+        help="Folder the case output folders are written to in watch mode, default clbExtract-cases.",
+    )
+
+    parser.add_argument(
+        "--settle",
+        dest="watchSettle",
+        required=False,
+        type=int,
+        help="Seconds a workbook's size must stay the same before it is processed in watch mode, default 10.",
+    )
+
+    parser.add_argument(
+        "--app-workers",
+        dest="appWorkers",
+        required=False,
+        type=int,
+        help="Number of app parsers to run at the same time in worker processes, needs pyarrow. Not used with -c.",
+    )
+
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        required=False,
+        action="store_true",
+        help="Continue an interrupted bulk run, skipping the files its journal recorded as complete.",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        dest="fileTimeout",
+        required=False,
+        type=int,
+        help="Seconds a file may take in bulk mode before it is stopped and recorded as failed.",
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        dest="maxMemory",
+        required=False,
+        type=int,
+        help="MB of memory the bulk processing workers may use together, files are started largest first while their estimated peaks fit.",
+    )
+
+    parser.add_argument(
+        "--sheets",
+        dest="partySheetNames",
+        required=False,
+        nargs="+",
+        choices=list(partySheets),
+        help='Also read the call and chat participants from these tabs into a PARTIES output, eg. --sheets "Call Log" Chats',
+    )
+
     args = parser.parse_args()
 
     if len(sys.argv) == 1:
         parser.print_help()
         parser.exit()
 
+    if args.chunkSize:
+        chunkSize = args.chunkSize
+
+    if args.useCache:
+        useCache = True
+
+    if args.noCache:
+        useCache = False
+
+    if args.profileRun:
+        profileRun = True
+
+    if args.exportThreads is not None:
+        exportThreads = args.exportThreads
+
+    if args.exportBudget:
+        exportBudget = args.exportBudget
+
+    if args.maxMemory:
+        maxMemory = args.maxMemory
+
+    if args.fileTimeout:
+        fileTimeout = args.fileTimeout
+
+    if args.appWorkers:
+        appWorkers = args.appWorkers
+
+    if args.partySheetNames:
+        partySheetNames = args.partySheetNames
+
+    if args.outputFormat:
+        if args.outputFormat in tableFormats and pyarrow is None:
+            print("pyarrow is needed to write {} outputs".format(args.outputFormat))
+            sys.exit(1)
+        if args.outputFormat == "csv.zst" and zstandard is None:
+            print("zstandard is needed to write csv.zst outputs")
+            sys.exit(1)
+        outputFormat = args.outputFormat
+
+    if args.phoneCountry:
+        phoneCountry = args.phoneCountry
+
+    if args.contactStore:
+        contactStore = args.contactStore
+
+    if args.purgeCache:
+        if os.path.isdir(cacheDir):
+            sheetCache(cacheDir, cacheLimit).purge()
+        print("Sheet cache purged")
+        logging.info("Sheet cache purged")
+
     if args.bulk:
         print("Bulk Process")
-        bulkProcessor(args.inputProvenance)
+        bulkProcessor(args.inputProvenance, args.workers, args.fullRun, args.resume)
+
+    if args.watchDir:
+        if args.watchSettle is not None:
+            watchSettle = args.watchSettle
+        watchFolder(args.watchDir, args.casesDir, args.inputProvenance, args.workers)
+
+    if args.report:
+        commonReport(args.report)
+
+    if args.query:
+        queryIndex(args.query)
 
     if args.inputFilename:
         if not os.path.exists(args.inputFilename):
@@ -4,6 +4,7 @@
 
 
 # Changelog
+# v0.3 - Files are processed in the background with progress bars and a cancel button
 # v0.2 - Minor changes, added provenance selector
 # v0.1 - Initial concept
 
@@ -13,6 +14,8 @@
 import clbExtract
 
 import os
+import queue
+import threading
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox
@@ -37,11 +40,84 @@ supportedAppsDisp = "\n".join(clbExtract.parsedApps)
 
 ## _____Functions live here_____
 
+# Processing runs on a worker thread so the window stays responsive. Progress is passed
+# back through events and read on the Tk thread by poll_events.
+events = queue.Queue()
+cancelEvent = threading.Event()
+clbExtract.cancelEvent = cancelEvent
+clbExtract.progressCallback = lambda progress: events.put(
+    ("rows", progress.status(), progress.rows, progress.total)
+)
+clbExtract.stepCallback = lambda step, name, done, total: events.put(
+    (step, name, done, total)
+)
+
+
+def run_in_background(target, *args):
+    cancelEvent.clear()
+    for button in [btn, btn2, btn3]:
+        button.config(state=DISABLED)
+    cancelBtn.config(state=NORMAL)
+    fileBar["value"] = 0
+    appBar["value"] = 0
+    statusLabel.config(text="Processing")
+
+    def worker():
+        try:
+            target(*args)
+            if cancelEvent.is_set():
+                events.put(("done", "Processing cancelled", None, None))
+            else:
+                events.put(("done", "Processing complete", None, None))
+        except clbExtract.processCancelled:
+            events.put(("done", "Processing cancelled", None, None))
+        except SystemExit:
+            events.put(("done", "Processing stopped", None, None))
+        except BaseException as e:
+            events.put(("done", "Processing failed - {}".format(e), None, None))
+
+    threading.Thread(target=worker, daemon=True).start()
+
+
+def poll_events():
+    try:
+        while True:
+            step, name, done, total = events.get_nowait()
+            if step == "file":
+                fileBar.config(maximum=max(total, 1), value=done)
+                if name is not None:
+                    statusLabel.config(text="Processing {}".format(name))
+            elif step == "app":
+                appBar.config(maximum=max(total, 1), value=done)
+            elif step == "rows":
+                statusLabel.config(text=name)
+            elif step == "done":
+                for button in [btn, btn2, btn3]:
+                    button.config(state=NORMAL)
+                cancelBtn.config(state=DISABLED)
+                statusLabel.config(text=name)
+                showinfo(title="Cellebrite Contact Extractor", message=name)
+    except queue.Empty:
+        pass
+    root.after(100, poll_events)
+
+
+# Stops the run once the current chunk or app has been processed
+def cancel_processing():
+    cancelEvent.set()
+    cancelBtn.config(state=DISABLED)
+    statusLabel.config(text="Cancelling")
+
 
-# TODO - Will need to pass in Provenance data here
 def process_all():
     print("Process all selected")
-    clbExtract.bulkProcessor(provMenu.get())
+    if not clbExtract.bulkInputFiles():
+        showinfo(
+            title="Cellebrite Contact Extractor",
+            message="No excel files located in {}".format(os.getcwd()),
+        )
+        return
+    run_in_background(clbExtract.bulkProcessor, provMenu.get())
 
 
 def select_file():
@@ -60,7 +136,7 @@ def select_file():
             message=filename.name,
         )
         print(provMenu.get())
-        clbExtract.processMetadata(filename.name, provMenu.get())
+        run_in_background(clbExtract.processMetadata, filename.name, provMenu.get())
 
 
 # Process selected file
@@ -68,7 +144,9 @@ def get_selection():
     selected_file = lbox.curselection()
     print(lbox.get(selected_file))
     print(provMenu.get())
-    clbExtract.processMetadata(lbox.get(selected_file), provMenu.get())
+    run_in_background(
+        clbExtract.processMetadata, lbox.get(selected_file), provMenu.get()
+    )
 
 
 def comboSelection(event):
@@ -78,7 +156,7 @@ def comboSelection(event):
 
 ### _____Create interface_____
 root = Tk()
-root.geometry("580x650")
+root.geometry("580x760")
 root.minsize(458, 580)
 root.maxsize(780, 780)
 root.configure(bg=LIGHT_GREY)
@@ -189,6 +267,23 @@ prog_data.pack()
 btn = Button(root, text="Locate file", command=select_file, bg=LIGHT_GREY)
 btn.pack(side=TOP, pady=10, padx=10)
 
+### Progress of the current run
+fileBar = ttk.Progressbar(root, orient=HORIZONTAL, length=300, mode="determinate")
+fileBar.pack(side=TOP, pady=2)
+appBar = ttk.Progressbar(root, orient=HORIZONTAL, length=300, mode="determinate")
+appBar.pack(side=TOP, pady=2)
+statusLabel = Label(text="", padx=10, bg=LIGHT_GREY, font=(FONT_1, 10))
+statusLabel.pack()
+
+cancelBtn = Button(
+    root,
+    text="Cancel",
+    command=cancel_processing,
+    bg=LIGHT_GREY,
+    state=DISABLED,
+)
+cancelBtn.pack(side=TOP, pady=5, padx=10)
+
 # Exit Program
 exitBtn = Button(root, text="Exit", command=root.destroy, bg=LIGHT_GREY)
 exitBtn.pack(side=TOP, pady=20, padx=10)
@@ -203,4 +298,5 @@ verLabel = Label(
 verLabel.pack()
 
 
+root.after(100, poll_events)
 root.mainloop()